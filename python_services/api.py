@@ -4,10 +4,10 @@ load_dotenv()
 import os
 # Now you can safely get environment variables
 api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is required")
+if not api_key and not os.getenv("OPENAI_BASE_URL"):
+    raise ValueError("OPENAI_API_KEY environment variable is required (or OPENAI_BASE_URL for a local endpoint)")
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 import os
 import logging
@@ -16,12 +16,28 @@ import subprocess
 import json
 import time
 import gc
+import math
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from common.video_processor import VideoProcessor
+from common.file_hash import hash_file
+from common.admission import AdmissionController, AdmissionRejected
+from common.single_flight import SingleFlight
+from common.http_client import PooledSession
+from common.video_metadata_cache import VideoMetadataCache
+from common.pipeline import StagePipeline
+from jobs.job_store import JobStore
+from jobs.job_manager import JobManager, NonRetryableJobError
 from gpt.gpt_service import GPTService
-from scene_detection.scene_detector import SceneDetector
+from gpt.usage import measure_usage
+from scene_detection.scene_detector import (
+    SceneDetector, detect_scenes_worker, detect_scenes_auto_worker, SPEED_PRESETS, DEFAULT_SPEED, DEFAULT_SCENES_PER_MINUTE
+)
+from scene_detection.scene_analysis import SCENE_METHODS, DEFAULT_THRESHOLDS
 from typing import Any, Dict
-import whisper
+from whisper_service.model_registry import model_registry
+from whisper_service.whisper_service import WhisperService
 import traceback
 import requests
 
@@ -42,30 +58,57 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 # Initialize services
 video_processor = VideoProcessor()
 gpt_service = GPTService()
-scene_detector = SceneDetector()
+# Identical requests arriving while one is already running share its result
+request_flights = SingleFlight("requests")
+# Bounds concurrent CPU-heavy (ffmpeg/Whisper/PySceneDetect) and I/O (GPT/Node) stages
+admission = AdmissionController()
+# Scene detection and Whisper take their own "cpu" slots, one per decode, time shard or chunk worker
+scene_detector = SceneDetector(slot=lambda: admission.slot("cpu"), idle_slot=lambda: admission.idle_slot("cpu"))
+whisper_service = WhisperService(
+    video_processor=video_processor,
+    slot=lambda min_free_mb: admission.slot("cpu", min_free_mb)
+)
 
 # Server configuration
-NODE_SERVER_URL = "http://localhost:5000"
+NODE_SERVER_URL = os.getenv('NODE_SERVER_URL', "http://localhost:5000")
+# Keep-alive connections to the Node.js server; a hung lookup fails after the read timeout
+node_session = PooledSession(
+    "node",
+    pool_size=int(os.getenv('NODE_POOL_SIZE', '16')),
+    connect_timeout=float(os.getenv('NODE_CONNECT_TIMEOUT', '3')),
+    read_timeout=float(os.getenv('NODE_READ_TIMEOUT', '10'))
+)
+# videoId -> (metadata, file path); repeated operations on a video skip the Node lookup
+video_metadata_cache = VideoMetadataCache()
+# Ids per call to the Node batch endpoint
+NODE_BATCH_SIZE = 100
+# "combined" sends the transcript once for summary, description and scene labels; "separate" calls per feature
+GENERATION_MODE = os.getenv('GPT_GENERATION_MODE', 'combined')
 
 def get_video_from_database(video_id):
     """Fetch video information from the Node.js server"""
+    return _lookup_video(video_id)[0]
+
+def _lookup_video(video_id):
+    """(video_data, from_node): from_node is False when the metadata was guessed from the uploads directory"""
     try:
         # Try to get video from Node.js server
-        response = requests.get(f"{NODE_SERVER_URL}/api/tutoring/videos/{video_id}", 
-                              headers={'Content-Type': 'application/json'})
+        with admission.slot("io"):
+            response = node_session.get(f"{NODE_SERVER_URL}/api/tutoring/videos/{video_id}", 
+                                        headers={'Content-Type': 'application/json'})
         
         if response.status_code == 200:
-            return response.json().get('video')
+            return response.json().get('video'), True
         elif response.status_code == 401 or response.status_code == 403:
             # Authentication failed, try to find video file directly
             logger.warning(f"Authentication failed for video {video_id}, trying direct file access")
-            return get_video_directly(video_id)
+            return get_video_directly(video_id), False
         else:
             logger.error(f"Failed to fetch video {video_id}: {response.status_code}")
-            return get_video_directly(video_id)
+            return get_video_directly(video_id), False
     except Exception as e:
         logger.error(f"Error fetching video from database: {str(e)}")
-        return get_video_directly(video_id)
+        return get_video_directly(video_id), False
 
 def get_video_directly(video_id):
     """Try to find video file directly in the uploads directory"""
@@ -128,7 +171,25 @@ def get_video_file_path(video_data):
         return None
     
     video_file = video_data['videoFile']
+    path = find_video_file(video_file)
+    if path:
+        logger.info(f"Found video file at: {path}")
+        return path
     
+    # If no file found, try to find any video file in uploads directory
+    uploads_dir = os.path.join(os.path.dirname(__file__), '..', 'server', 'uploads', 'videos')
+    if os.path.exists(uploads_dir):
+        video_files = [f for f in os.listdir(uploads_dir) if f.endswith(('.mp4', '.avi', '.mov', '.mkv'))]
+        if video_files:
+            fallback_path = os.path.join(uploads_dir, video_files[0])
+            logger.warning(f"Using fallback video file: {fallback_path}")
+            return fallback_path
+    
+    logger.error(f"Video file not found for: {video_file}")
+    return None
+
+def find_video_file(video_file):
+    """The existing file a videoFile value names, or None (no guessing)"""
     # Try multiple possible paths
     possible_paths = [
         # Path relative to Python service
@@ -143,32 +204,191 @@ def get_video_file_path(video_data):
     
     for path in possible_paths:
         if path and os.path.exists(path):
-            logger.info(f"Found video file at: {path}")
             return path
+    return None
+
+def resolve_video(video_id):
+    """(video_data, video_path) for a video id, served from the metadata cache while the file is unchanged
     
-    # If no file found, try to find any video file in uploads directory
-    uploads_dir = os.path.join(os.path.dirname(__file__), '..', 'server', 'uploads', 'videos')
-    if os.path.exists(uploads_dir):
-        video_files = [f for f in os.listdir(uploads_dir) if f.endswith(('.mp4', '.avi', '.mov', '.mkv'))]
-        if video_files:
-            fallback_path = os.path.join(uploads_dir, video_files[0])
-            logger.warning(f"Using fallback video file: {fallback_path}")
-            return fallback_path
+    video_data is None when the video is unknown, video_path is None when its file is missing.
+    """
+    cached = video_metadata_cache.get(video_id)
+    if cached is not None:
+        return cached
+    return request_flights.do(('resolve-video', video_id), _resolve_video_uncached, video_id)
+
+def _resolve_video_uncached(video_id):
+    video_data, from_node = _lookup_video(video_id)
+    return _store_resolved_video(video_id, video_data, from_node)
+
+def _store_resolved_video(video_id, video_data, from_node):
+    video_path = get_video_file_path(video_data) if video_data else None
+    if video_path:
+        video_path = os.path.abspath(video_path)
+        # Guesses (metadata from the uploads directory, the first video file) may be the wrong file,
+        # so only Node metadata whose videoFile exists as named is cached
+        if from_node and video_path == os.path.abspath(find_video_file(video_data['videoFile']) or ''):
+            video_metadata_cache.put(video_id, video_data, video_path)
+    return video_data, video_path
+
+def fetch_videos_from_database(video_ids):
+    """Metadata for many videos in one Node.js call: {id: video}, or None when the batch endpoint is unavailable
     
-    logger.error(f"Video file not found for: {video_file}")
-    logger.error(f"Tried paths: {possible_paths}")
-    return None
+    Ids the server does not return, or all of them when it refuses access, are mapped to None.
+    """
+    try:
+        with admission.slot("io"):
+            response = node_session.post(f"{NODE_SERVER_URL}/api/tutoring/videos/batch",
+                                         json={"ids": list(video_ids)})
+        if response.status_code in (401, 403):
+            # Same as the single lookup: without access, look for the files directly
+            logger.warning("Authentication failed for batch video lookup, trying direct file access")
+            return {video_id: None for video_id in video_ids}
+        if response.status_code != 200:
+            logger.error(f"Batch video lookup failed: {response.status_code}")
+            return None
+        videos = {str(video.get('id')): video for video in response.json().get('videos', [])}
+        return {video_id: videos.get(video_id) for video_id in video_ids}
+    except Exception as e:
+        logger.error(f"Error fetching videos from database: {str(e)}")
+        return None
+
+def resolve_videos(video_ids):
+    """resolve_video for many ids (e.g. a backfill): cache first, then one Node call per NODE_BATCH_SIZE ids"""
+    results = {}
+    missing = []
+    for video_id in dict.fromkeys(video_ids):
+        cached = video_metadata_cache.get(video_id)
+        if cached is not None:
+            results[video_id] = cached
+        else:
+            missing.append(video_id)
+    
+    for i in range(0, len(missing), NODE_BATCH_SIZE):
+        batch = missing[i:i + NODE_BATCH_SIZE]
+        videos = fetch_videos_from_database(batch)
+        if videos is None:
+            # Older Node server without the batch endpoint: fall back to single lookups
+            with ThreadPoolExecutor(max_workers=min(8, len(batch))) as executor:
+                results.update(zip(batch, executor.map(resolve_video, batch)))
+            continue
+        for video_id in batch:
+            if videos[video_id] is not None:
+                results[video_id] = _store_resolved_video(video_id, videos[video_id], True)
+            else:
+                results[video_id] = _store_resolved_video(video_id, get_video_directly(video_id), False)
+    return results
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "service": "AI Video Processing"})
+    return jsonify({
+        "status": "healthy",
+        "service": "AI Video Processing",
+        "whisper_models": model_registry.stats(),
+        "transcript_cache": whisper_service.transcript_cache.stats(),
+        "scene_metrics_cache": scene_detector.metrics_cache.stats(),
+        "gpt_cache": gpt_service.response_cache.stats(),
+        "gpt_usage": gpt_service.usage_report.stats(),
+        "gpt_circuit_breaker": gpt_service.breaker.stats(),
+        "http_pools": {"node": node_session.stats(), "openai": gpt_service.http_stats()},
+        "video_metadata_cache": video_metadata_cache.stats(),
+        "coalesced_requests": request_flights.stats(),
+        "admission": admission.stats()
+    })
+
+def admission_controlled(*pools):
+    """Answer 429 with Retry-After and the queue position when the given pools are saturated"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                admitted = admission.admit(*pools)
+            except AdmissionRejected as e:
+                response = jsonify({
+                    "error": "Server is busy, please retry later",
+                    "reason": e.reason,
+                    "queue_position": e.queue_position,
+                    "retry_after": e.retry_after
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+            
+            g.admission = admitted
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except Exception:
+                admitted.release()
+                raise
+            if response.is_streamed:
+                # Streaming responses keep working after the view returns
+                response.call_on_close(admitted.release)
+            else:
+                admitted.release()
+            return response
+        return wrapper
+    return decorator
+
+def coalesce(key, func):
+    """request_flights.do for an admitted request; one that joins an in-flight call gives back
+    its admission while it waits, since only the leader runs any stage"""
+    admitted = g.get('admission')
+    return request_flights.do(key, func, on_join=admitted.release if admitted else None)
+
+def upload_flight_key(route, video_path):
+    """Coalescing key for an upload: the route, the uploaded bytes and the form options"""
+    return (route, hash_file(video_path), tuple(sorted(request.form.items())))
+
+def unknown_speed(speed):
+    """True when a request names a scene detection speed preset that does not exist"""
+    return bool(speed) and speed not in SPEED_PRESETS
+
+def unknown_speed_response(speed):
+    return jsonify({"error": f"Unknown speed preset: {speed} (use one of {', '.join(SPEED_PRESETS)})"}), 400
+
+def parse_scene_threshold(value, default=27.0):
+    """A request's scene threshold: 'auto' or a number (ValueError otherwise)"""
+    if value is None or value == '':
+        return default
+    if str(value).lower() == 'auto':
+        return 'auto'
+    try:
+        threshold = float(value)
+    except TypeError:
+        raise ValueError(f"Invalid scene threshold: {value!r}")
+    if not math.isfinite(threshold) or threshold < 0:
+        raise ValueError(f"Invalid scene threshold: {value!r}")
+    return threshold
+
+def invalid_threshold_response(value, allow_auto=True):
+    hint = "use a number or 'auto'" if allow_auto else "use a number"
+    return jsonify({"error": f"Invalid scene threshold: {value} ({hint})"}), 400
+
+def parse_scenes_per_minute(value, default=DEFAULT_SCENES_PER_MINUTE):
+    """A request's auto-threshold scene density: a positive number (ValueError otherwise)"""
+    if value is None or value == '':
+        return default
+    try:
+        scenes_per_minute = float(value)
+    except TypeError:
+        raise ValueError(f"Invalid scenes per minute: {value!r}")
+    if not math.isfinite(scenes_per_minute) or scenes_per_minute <= 0:
+        raise ValueError(f"Invalid scenes per minute: {value!r}")
+    return scenes_per_minute
+
+def invalid_scenes_per_minute_response(value):
+    return jsonify({"error": f"Invalid scenes per minute: {value} (use a positive number)"}), 400
+
+def video_flight_key(route, video_id, video_title, features=(), *options):
+    """Coalescing key for a videoId request: the route, the video, the requested features and options"""
+    return (route, video_id, video_title, tuple(sorted(features))) + options
 
 @app.route('/transcribe', methods=['POST'])
+@admission_controlled('cpu')
 def transcribe_video():
     """Transcribe video audio using Whisper"""
     video_path = None
-    audio_path = None
     
     try:
         # Check if video file is present
@@ -186,25 +406,22 @@ def transcribe_video():
         video_path = video_processor.save_video_file(video_file, app.config['UPLOAD_FOLDER'])
         
         try:
-            # Get video information
-            video_info = scene_detector.get_video_info(video_path)
-            
-            # Extract audio from video
-            logger.info("Extracting audio from video...")
-            audio_path = video_processor.extract_audio_from_video(video_path)
-            
-            # Transcribe audio
-            logger.info("Transcribing audio with Whisper...")
-            model = whisper.load_model('base')
-            transcript_result = model.transcribe(audio_path)
-            transcript = transcript_result["text"]
+            def compute():
+                # Get video information
+                video_info = scene_detector.get_video_info(video_path)
+                
+                # Transcribe audio (cached by video content)
+                transcript_result = whisper_service.transcribe_video(video_path, 'base')
+                transcript = transcript_result["text"]
+                
+                return {
+                    "transcript": transcript,
+                    "duration": video_info.get('duration', 0),
+                    "duration_formatted": video_info.get('duration_formatted', '00:00'),
+                    "fps": video_info.get('fps', 30.0)
+                }
             
-            return jsonify({
-                "transcript": transcript,
-                "duration": video_info.get('duration', 0),
-                "duration_formatted": video_info.get('duration_formatted', '00:00'),
-                "fps": video_info.get('fps', 30.0)
-            })
+            return jsonify(coalesce(upload_flight_key('transcribe', video_path), compute))
             
         except Exception as e:
             logger.error("Error transcribing video:\n" + traceback.format_exc())
@@ -216,13 +433,106 @@ def transcribe_video():
     
     finally:
         # Clean up files
-        video_processor.cleanup_files(video_path, audio_path)
+        video_processor.cleanup_files(video_path)
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def transcript_event_stream(video_path, video_info, cleanup_path=None):
+    """Stream Whisper segments as SSE 'segment' events followed by a 'summary' event"""
+    started = time.time()
+    try:
+        yield sse_event("start", video_info)
+        
+        for event, payload in whisper_service.stream_transcribe_video(video_path, 'base'):
+            if event == "segment":
+                yield sse_event("segment", {
+                    "id": payload.get("id"),
+                    "start": payload["start"],
+                    "end": payload["end"],
+                    "text": payload["text"]
+                })
+            else:
+                yield sse_event("summary", {
+                    "transcript": payload["text"],
+                    "segment_count": len(payload.get("segments", [])),
+                    "language": payload.get("language"),
+                    "duration": video_info.get('duration', 0),
+                    "duration_formatted": video_info.get('duration_formatted', '00:00'),
+                    "fps": video_info.get('fps', 30.0),
+                    "elapsed_seconds": round(time.time() - started, 2)
+                })
+    
+    except Exception as e:
+        logger.error("Error streaming transcription:\n" + traceback.format_exc())
+        yield sse_event("error", {"error": str(e)})
+    
+    finally:
+        # Uploaded files can only be removed once the stream has finished
+        video_processor.cleanup_files(cleanup_path)
+
+def sse_response(events):
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop reverse proxies from buffering the stream
+    })
+
+@app.route('/transcribe/stream', methods=['POST'])
+@admission_controlled('cpu')
+def transcribe_video_stream():
+    """Transcribe uploaded video, streaming segments as Server-Sent Events"""
+    try:
+        if 'video' not in request.files:
+            return jsonify({"error": "No video file provided"}), 400
+        
+        video_file = request.files['video']
+        if video_file.filename == '':
+            return jsonify({"error": "No video file selected"}), 400
+        
+        if not video_processor.allowed_file(video_file.filename):
+            return jsonify({"error": "Invalid file type"}), 400
+        
+        video_path = video_processor.save_video_file(video_file, app.config['UPLOAD_FOLDER'])
+        video_info = scene_detector.get_video_info(video_path)
+        
+        return sse_response(transcript_event_stream(video_path, video_info, cleanup_path=video_path))
+        
+    except Exception as e:
+        logger.error("Error transcribing video:\n" + traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/ai/transcribe/stream', methods=['POST'])
+@admission_controlled('cpu', 'io')
+def transcribe_video_id_stream():
+    """Transcribe an existing video by ID, streaming segments as Server-Sent Events"""
+    try:
+        data = request.get_json()
+        video_id = data.get('videoId')
+        
+        if not video_id:
+            return jsonify({"error": "No video ID provided"}), 400
+        
+        video_data, video_path = resolve_video(video_id)
+        if not video_data:
+            return jsonify({"error": "Video not found"}), 404
+        
+        if not video_path:
+            return jsonify({"error": "Video file not found"}), 404
+        
+        video_info = scene_detector.get_video_info(video_path)
+        
+        return sse_response(transcript_event_stream(video_path, video_info))
+        
+    except Exception as e:
+        logger.error(f"Error streaming transcription: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/generate-description', methods=['POST'])
+@admission_controlled('cpu', 'io')
 def generate_description():
     """Generate short description for video"""
     video_path = None
-    audio_path = None
     
     try:
         # Check if video file is present
@@ -243,30 +553,30 @@ def generate_description():
         video_path = video_processor.save_video_file(video_file, app.config['UPLOAD_FOLDER'])
         
         try:
-            # Get video information
-            video_info = scene_detector.get_video_info(video_path)
-            
-            # Extract audio from video
-            logger.info("Extracting audio from video...")
-            audio_path = video_processor.extract_audio_from_video(video_path)
-            
-            # Transcribe audio
-            logger.info("Transcribing audio with Whisper...")
-            model = whisper.load_model('base')
-            transcript_result = model.transcribe(audio_path)
-            transcript = transcript_result["text"]
-            
-            # Generate description
-            logger.info("Generating description with GPT...")
-            description = gpt_service.generate_description(transcript, video_title)
+            def compute():
+                # Get video information
+                video_info = scene_detector.get_video_info(video_path)
+                
+                # Transcribe audio (cached by video content)
+                transcript_result = whisper_service.transcribe_video(video_path, 'base')
+                transcript = transcript_result["text"]
+                
+                # Generate description
+                logger.info("Generating description with GPT...")
+                with admission.slot("io"):
+                    description = gpt_service.generate_description(
+                        transcript, video_title, segments=transcript_result.get("segments")
+                    )
+                
+                return {
+                    "description": description,
+                    "transcript": transcript,
+                    "duration": video_info.get('duration', 0),
+                    "duration_formatted": video_info.get('duration_formatted', '00:00'),
+                    "fps": video_info.get('fps', 30.0)
+                }
             
-            return jsonify({
-                "description": description,
-                "transcript": transcript,
-                "duration": video_info.get('duration', 0),
-                "duration_formatted": video_info.get('duration_formatted', '00:00'),
-                "fps": video_info.get('fps', 30.0)
-            })
+            return jsonify(coalesce(upload_flight_key('generate-description', video_path), compute))
             
         except Exception as e:
             logger.error("Error generating description:\n" + traceback.format_exc())
@@ -278,13 +588,13 @@ def generate_description():
     
     finally:
         # Clean up files
-        video_processor.cleanup_files(video_path, audio_path)
+        video_processor.cleanup_files(video_path)
 
 @app.route('/process-video', methods=['POST'])
+@admission_controlled('cpu', 'io')
 def process_video():
     """Process video file and generate AI content"""
     video_path = None
-    audio_path = None
     
     try:
         # Check if video file is present
@@ -302,89 +612,107 @@ def process_video():
         video_title = request.form.get('title', '')
         process_type = request.form.get('type', 'summary')  # summary, timestamps, scenes, description, or all
         scene_method = request.form.get('scene_method', 'content')  # content, adaptive, threshold
+        speed = request.form.get('speed')  # accurate, balanced, fast (see SPEED_PRESETS)
+        if unknown_speed(speed):
+            return unknown_speed_response(speed)
+        try:
+            threshold = parse_scene_threshold(request.form.get('threshold'), default=12 if scene_method == 'threshold' else 27.0)
+        except ValueError:
+            threshold = None
+        if threshold is None or threshold == 'auto':
+            # This route has no threshold search
+            return invalid_threshold_response(request.form.get('threshold'), allow_auto=False)
         
         # Save video file temporarily
         video_path = video_processor.save_video_file(video_file, app.config['UPLOAD_FOLDER'])
         
         try:
-            result: Dict[str, Any] = {
-                "transcript": None,
-                "summary": None,
-                "description": None,
-                "timestamps": None,
-                "scenes": None,
-                "video_info": None
-            }
-            
-            # Get video information
-            logger.info("Getting video information...")
-            result["video_info"] = scene_detector.get_video_info(video_path)
-            
-            # Extract audio and transcribe if needed for summary/description
-            if process_type in ['summary', 'description', 'all']:
-                logger.info("Extracting audio from video...")
-                audio_path = video_processor.extract_audio_from_video(video_path)
+            def compute():
+                result: Dict[str, Any] = {
+                    "transcript": None,
+                    "summary": None,
+                    "description": None,
+                    "timestamps": None,
+                    "scenes": None,
+                    "video_info": None
+                }
                 
-                logger.info("Transcribing audio with Whisper...")
-                model = whisper.load_model('base')
-                transcript_result = model.transcribe(audio_path)
-                result["transcript"] = transcript_result["text"]
+                needs_transcript = process_type in ['summary', 'description', 'all']
+                needs_scenes = process_type in ['timestamps', 'scenes', 'all']
                 
-                # Generate summary if requested
-                if process_type in ['summary', 'all']:
-                    logger.info("Generating summary with GPT...")
-                    result["summary"] = gpt_service.generate_summary(result["transcript"], video_title)
+                # Get video information
+                logger.info("Getting video information...")
+                result["video_info"] = scene_detector.get_video_info(video_path)
                 
-                # Generate description if requested
-                if process_type in ['description', 'all']:
-                    logger.info("Generating description with GPT...")
-                    result["description"] = gpt_service.generate_description(result["transcript"], video_title)
-            
-            # Detect scenes for timestamps
-            if process_type in ['timestamps', 'scenes', 'all']:
-                logger.info("Detecting scenes with PySceneDetect...")
-                min_scene_length = 1.0
-                if scene_method == 'adaptive':
-                    result["scenes"] = scene_detector.detect_scenes_adaptive(video_path, min_scene_length=min_scene_length)
-                elif scene_method == 'threshold':
-                    threshold = int(float(request.form.get('threshold', 12)))
-                    result["scenes"] = scene_detector.detect_scenes_threshold(video_path, threshold=threshold, min_scene_length=min_scene_length)
-                else:  # content detection (default)
-                    threshold = float(request.form.get('threshold', 27.0))
-                    result["scenes"] = scene_detector.detect_scenes(video_path, threshold=threshold, min_scene_length=min_scene_length)
-            
-            # Generate GPT timestamps if requested
-            gpt_timestamps = None
-            if process_type in ['timestamps', 'all'] and result["transcript"]:
-                logger.info("Generating timestamps with GPT...")
-                gpt_timestamps = gpt_service.generate_timestamps(result["transcript"], video_title)
-            
-            # Combine scene detection with GPT timestamps
-            if result["scenes"] and gpt_timestamps:
-                logger.info("Combining scene detection with GPT timestamps...")
-                result["timestamps"] = scene_detector.combine_with_gpt_timestamps(
-                    result["scenes"], gpt_timestamps, video_title
-                )
-            elif result["scenes"]:
-                # Use only scene detection timestamps
-                result["timestamps"] = [
-                    {
-                        "time": scene["time"],
-                        "description": scene["description"]
-                    }
-                    for scene in result["scenes"]
-                ]
-            elif gpt_timestamps:
-                # Use only GPT timestamps
-                result["timestamps"] = gpt_timestamps
-            
-            # After all timestamp generation logic, ensure all timestamps use 'time_start'
-            if result["timestamps"]:
-                for ts in result["timestamps"]:
-                    if 'time' in ts and 'time_start' not in ts:
-                        ts['time_start'] = ts.pop('time')
+                # Transcribe if needed for summary/description (cached by video content)
+                if needs_transcript:
+                    transcript_result = whisper_service.transcribe_video(video_path, 'base')
+                    result["transcript"] = transcript_result["text"]
+                
+                    # Generate summary if requested
+                    if process_type in ['summary', 'all']:
+                        logger.info("Generating summary with GPT...")
+                        with admission.slot("io"):
+                            result["summary"] = gpt_service.generate_summary(
+                                result["transcript"], video_title, segments=transcript_result.get("segments")
+                            )
+                
+                    # Generate description if requested
+                    if process_type in ['description', 'all']:
+                        logger.info("Generating description with GPT...")
+                        with admission.slot("io"):
+                            result["description"] = gpt_service.generate_description(
+                                result["transcript"], video_title, segments=transcript_result.get("segments")
+                            )
+                
+                # Detect scenes for timestamps
+                if needs_scenes:
+                    logger.info("Detecting scenes with PySceneDetect...")
+                    min_scene_length = 1.0
+                    if scene_method == 'adaptive':
+                        result["scenes"] = scene_detector.detect_scenes_adaptive(video_path, min_scene_length=min_scene_length, speed=speed)
+                    elif scene_method == 'threshold':
+                        result["scenes"] = scene_detector.detect_scenes_threshold(video_path, threshold=int(threshold), min_scene_length=min_scene_length, speed=speed)
+                    else:  # content detection (default)
+                        result["scenes"] = scene_detector.detect_scenes(video_path, threshold=threshold, min_scene_length=min_scene_length, speed=speed)
+                
+                # Generate GPT timestamps if requested
+                gpt_timestamps = None
+                if process_type in ['timestamps', 'all'] and result["transcript"]:
+                    logger.info("Generating timestamps with GPT...")
+                    with admission.slot("io"):
+                        gpt_timestamps = gpt_service.generate_timestamps(
+                            result["transcript"], video_title, segments=transcript_result.get("segments")
+                        )
+                
+                # Combine scene detection with GPT timestamps
+                if result["scenes"] and gpt_timestamps:
+                    logger.info("Combining scene detection with GPT timestamps...")
+                    result["timestamps"] = scene_detector.combine_with_gpt_timestamps(
+                        result["scenes"], gpt_timestamps, video_title
+                    )
+                elif result["scenes"]:
+                    # Use only scene detection timestamps
+                    result["timestamps"] = [
+                        {
+                            "time": scene["time"],
+                            "description": scene["description"]
+                        }
+                        for scene in result["scenes"]
+                    ]
+                elif gpt_timestamps:
+                    # Use only GPT timestamps
+                    result["timestamps"] = gpt_timestamps
+                
+                # After all timestamp generation logic, ensure all timestamps use 'time_start'
+                if result["timestamps"]:
+                    for ts in result["timestamps"]:
+                        if 'time' in ts and 'time_start' not in ts:
+                            ts['time_start'] = ts.pop('time')
+                
+                return result
             
-            return jsonify(result)
+            return jsonify(coalesce(upload_flight_key('process-video', video_path), compute))
             
         except Exception as e:
             logger.error("Error processing video:\n" + traceback.format_exc())
@@ -396,9 +724,10 @@ def process_video():
     
     finally:
         # Clean up files
-        video_processor.cleanup_files(video_path, audio_path)
+        video_processor.cleanup_files(video_path)
 
 @app.route('/detect-scenes', methods=['POST'])
+@admission_controlled('cpu')
 def detect_scenes():
     """Detect scenes in video using PySceneDetect"""
     video_path = None
@@ -416,31 +745,83 @@ def detect_scenes():
         
         # Get parameters
         scene_method = request.form.get('method', 'content')
-        threshold = int(float(request.form.get('threshold', 27.0)))
+        try:
+            threshold = parse_scene_threshold(request.form.get('threshold'))
+        except ValueError:
+            return invalid_threshold_response(request.form.get('threshold'))
+        if threshold != 'auto':
+            threshold = int(threshold)
+        # Only used with threshold=auto: the scene density the threshold search aims for
+        try:
+            scenes_per_minute = parse_scenes_per_minute(request.form.get('scenes_per_minute'))
+        except ValueError:
+            return invalid_scenes_per_minute_response(request.form.get('scenes_per_minute'))
         min_scene_length = float(request.form.get('min_scene_length', 1.0))
+        speed = request.form.get('speed')
+        if unknown_speed(speed):
+            return unknown_speed_response(speed)
         
         # Save video file temporarily
         video_path = video_processor.save_video_file(video_file, app.config['UPLOAD_FOLDER'])
         
         try:
-            # Get video information
-            video_info = scene_detector.get_video_info(video_path)
-            
-            # Detect scenes based on method
-            if scene_method == 'adaptive':
-                scenes = scene_detector.detect_scenes_adaptive(video_path, min_scene_length)
-            elif scene_method == 'threshold':
-                scenes = scene_detector.detect_scenes_threshold(video_path, threshold, min_scene_length)
-            else:  # content detection
-                scenes = scene_detector.detect_scenes(video_path, threshold, min_scene_length)
+            def compute():
+                # Get video information
+                video_info = scene_detector.get_video_info(video_path)
+                
+                methods = SCENE_METHODS if scene_method == 'all' else [scene_method if scene_method in SCENE_METHODS else 'content']
+                # AdaptiveDetector has always run with its own default ratio here
+                thresholds = {"content": threshold, "adaptive": DEFAULT_THRESHOLDS["adaptive"], "threshold": threshold}
+                
+                full_analysis = threshold == 'auto' or scene_method == 'all' or scene_detector.has_analysis(video_path, speed)
+                if full_analysis:
+                    # Per-frame metrics are cached by content hash, so re-running with another
+                    # threshold or min_scene_length skips the decode. The full-frame analysis is
+                    # only worth decoding for when tuning (auto threshold, every method).
+                    analysis = scene_detector.analyze(video_path, speed)
+                    if threshold == 'auto':
+                        # Searched over the same cached metrics, one threshold per method
+                        thresholds = {
+                            method: analysis.auto_threshold(method, scenes_per_minute, min_scene_length)[0]
+                            for method in methods
+                        }
+                    
+                    # With 'all', "scenes" stays the content result
+                    scenes_by_method = {
+                        method: scene_detector.scenes_from_analysis(analysis, method, thresholds.get(method), min_scene_length)
+                        for method in methods
+                    }
+                    scenes = scenes_by_method[methods[0]]
+                else:
+                    # One method at a fixed threshold: frame skip and shards of the speed preset
+                    if methods[0] == 'adaptive':
+                        scenes = scene_detector.detect_scenes_adaptive(video_path, min_scene_length, speed=speed)
+                    elif methods[0] == 'threshold':
+                        scenes = scene_detector.detect_scenes_threshold(video_path, threshold, min_scene_length, speed=speed)
+                    else:  # content detection
+                        scenes = scene_detector.detect_scenes(video_path, threshold, min_scene_length, speed=speed)
+                    # Fill the metrics cache off the request path so re-tuning this video is a file read
+                    scene_detector.analyze_in_background(video_path, speed)
+                
+                result = {
+                    "scenes": scenes,
+                    "video_info": video_info,
+                    "method": scene_method,
+                    "threshold": thresholds[methods[0]],
+                    "auto_threshold": threshold == 'auto',
+                    "min_scene_length": min_scene_length,
+                    "speed": speed or DEFAULT_SPEED,
+                    # The cached analysis covers every frame: only the preset's downscale applies
+                    "every_frame": full_analysis
+                }
+                if threshold == 'auto':
+                    result["scenes_per_minute"] = scenes_per_minute
+                if scene_method == 'all':
+                    result["scenes_by_method"] = scenes_by_method
+                    result["thresholds_by_method"] = thresholds
+                return result
             
-            return jsonify({
-                "scenes": scenes,
-                "video_info": video_info,
-                "method": scene_method,
-                "threshold": threshold,
-                "min_scene_length": min_scene_length
-            })
+            return jsonify(coalesce(upload_flight_key('detect-scenes', video_path), compute))
             
         except Exception as e:
             logger.error("Error detecting scenes:\n" + traceback.format_exc())
@@ -455,6 +836,7 @@ def detect_scenes():
         video_processor.cleanup_files(video_path)
 
 @app.route('/generate-summary', methods=['POST'])
+@admission_controlled('io')
 def generate_summary():
     """Generate summary from existing transcript"""
     try:
@@ -465,7 +847,8 @@ def generate_summary():
         if not transcript:
             return jsonify({"error": "No transcript provided"}), 400
         
-        summary = gpt_service.generate_summary(transcript, video_title)
+        with admission.slot("io"):
+            summary = gpt_service.generate_summary(transcript, video_title)
         
         return jsonify({"summary": summary})
         
@@ -474,6 +857,7 @@ def generate_summary():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/generate-timestamps', methods=['POST'])
+@admission_controlled('io')
 def generate_timestamps():
     """Generate timestamps from existing transcript"""
     try:
@@ -484,7 +868,8 @@ def generate_timestamps():
         if not transcript:
             return jsonify({"error": "No transcript provided"}), 400
         
-        timestamps = gpt_service.generate_timestamps(transcript, video_title)
+        with admission.slot("io"):
+            timestamps = gpt_service.generate_timestamps(transcript, video_title)
         
         return jsonify({"timestamps": timestamps})
         
@@ -515,6 +900,7 @@ def combine_timestamps():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/ai/generate-summary', methods=['POST'])
+@admission_controlled('cpu', 'io')
 def generate_summary_from_video_id():
     """Generate summary from video ID (for existing videos)"""
     try:
@@ -525,32 +911,26 @@ def generate_summary_from_video_id():
         if not video_id:
             return jsonify({"error": "No video ID provided"}), 400
         
-        # Get video from database
-        video_data = get_video_from_database(video_id)
+        # Get video metadata and file path (cached while the file is unchanged)
+        video_data, video_path = resolve_video(video_id)
         if not video_data:
             return jsonify({"error": "Video not found"}), 404
         
-        # Get video file path
-        video_path = get_video_file_path(video_data)
         if not video_path:
             return jsonify({"error": "Video file not found"}), 404
         
-        # Extract audio and transcribe
-        logger.info(f"Processing video {video_id} for summary generation...")
-        audio_path = video_processor.extract_audio_from_video(video_path)
-        
-        # Transcribe with Whisper
-        logger.info("Transcribing audio with Whisper...")
-        model = whisper.load_model('base')
-        transcript_result = model.transcribe(audio_path)
-        transcript = transcript_result["text"]
-        
-        # Generate summary
-        logger.info("Generating summary with GPT...")
-        summary = gpt_service.generate_summary(transcript, video_title)
+        def compute():
+            # Transcribe once (cached by video content)
+            logger.info(f"Processing video {video_id} for summary generation...")
+            transcript_result = whisper_service.transcribe_video(video_path, 'base')
+            transcript = transcript_result["text"]
+            
+            # Generate summary
+            logger.info("Generating summary with GPT...")
+            with admission.slot("io"):
+                return gpt_service.generate_summary(transcript, video_title, segments=transcript_result.get("segments"))
         
-        # Clean up audio file
-        video_processor.cleanup_files(None, audio_path)
+        summary = coalesce(video_flight_key('summary', video_id, video_title), compute)
         
         return jsonify({"summary": summary})
         
@@ -559,6 +939,7 @@ def generate_summary_from_video_id():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/ai/generate-description', methods=['POST'])
+@admission_controlled('cpu', 'io')
 def generate_description_from_video_id():
     """Generate description from video ID (for existing videos)"""
     try:
@@ -569,32 +950,26 @@ def generate_description_from_video_id():
         if not video_id:
             return jsonify({"error": "No video ID provided"}), 400
         
-        # Get video from database
-        video_data = get_video_from_database(video_id)
+        # Get video metadata and file path (cached while the file is unchanged)
+        video_data, video_path = resolve_video(video_id)
         if not video_data:
             return jsonify({"error": "Video not found"}), 404
         
-        # Get video file path
-        video_path = get_video_file_path(video_data)
         if not video_path:
             return jsonify({"error": "Video file not found"}), 404
         
-        # Extract audio and transcribe
-        logger.info(f"Processing video {video_id} for description generation...")
-        audio_path = video_processor.extract_audio_from_video(video_path)
-        
-        # Transcribe with Whisper
-        logger.info("Transcribing audio with Whisper...")
-        model = whisper.load_model('base')
-        transcript_result = model.transcribe(audio_path)
-        transcript = transcript_result["text"]
-        
-        # Generate description
-        logger.info("Generating description with GPT...")
-        description = gpt_service.generate_description(transcript, video_title)
+        def compute():
+            # Transcribe once (cached by video content)
+            logger.info(f"Processing video {video_id} for description generation...")
+            transcript_result = whisper_service.transcribe_video(video_path, 'base')
+            transcript = transcript_result["text"]
+            
+            # Generate description
+            logger.info("Generating description with GPT...")
+            with admission.slot("io"):
+                return gpt_service.generate_description(transcript, video_title, segments=transcript_result.get("segments"))
         
-        # Clean up audio file
-        video_processor.cleanup_files(None, audio_path)
+        description = coalesce(video_flight_key('description', video_id, video_title), compute)
         
         return jsonify({"description": description})
         
@@ -602,176 +977,406 @@ def generate_description_from_video_id():
         logger.error(f"Error generating description: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def combine_main_scene_descriptions(main_scenes, scene_descriptions):
+    """Attach GPT descriptions to the main PySceneDetect scenes"""
+    descriptions = {desc["scene_index"]: desc["description"] for desc in scene_descriptions}
+    final_timestamps = []
+    
+    for i, scene_ts in enumerate(main_scenes):
+        # Use GPT description if available, otherwise use scene description
+        description = descriptions.get(i) or scene_ts["description"]
+        
+        final_timestamps.append({
+            "time_start": scene_ts["time_start"],
+            "description": description,
+            "scene_info": f"Main Scene {i+1}",
+            "duration": scene_ts["duration"]
+        })
+    
+    return final_timestamps
+
+def generation_mode(features, mode=None):
+    """Combined generation only pays off when at least two GPT features share the transcript"""
+    mode = mode or GENERATION_MODE
+    if mode == 'combined' and len({'summary', 'description', 'timestamps'} & set(features)) >= 2:
+        return 'combined'
+    return 'separate'
+
+def add_scene_stages(pipeline, video_path, speed=None, scene_threshold=27.0, scenes_per_minute=None):
+    """The "scenes" stage; with scene_threshold 'auto' a "scene_detection" stage searches for the threshold first"""
+    if scene_threshold == 'auto':
+        pipeline.add_stage(
+            "scene_detection", detect_scenes_auto_worker,
+            kwargs={"scenes_per_minute": scenes_per_minute, "min_scene_length": 1.0, "speed": speed},
+            args=(video_path,), in_process=True, resource="cpu"
+        )
+        pipeline.add_stage("scenes", lambda scene_detection: scene_detection["scenes"], deps=["scene_detection"])
+        return
+    if scene_detector.shard_count(video_path) > 1:
+        # Long video: shards fan out from this process, each under its own "cpu" slot
+        pipeline.add_stage(
+            "scenes", scene_detector.detect_scenes,
+            kwargs={"threshold": scene_threshold, "min_scene_length": 1.0, "speed": speed},
+            args=(video_path,)
+        )
+        return
+    pipeline.add_stage(
+        "scenes", detect_scenes_worker,
+        kwargs={"threshold": scene_threshold, "min_scene_length": 1.0, "speed": speed},
+        args=(video_path,), in_process=True, resource="cpu"
+    )
+
+def scene_threshold_used(results, scene_threshold):
+    """The threshold the pipeline's scene detection ran with (the chosen one in auto mode)"""
+    if scene_threshold == 'auto':
+        return (results.get("scene_detection") or {}).get("threshold")
+    return scene_threshold
+
+def build_video_pipeline(video_path, video_title, features, mode='separate', speed=None, scene_threshold=27.0,
+                         scenes_per_minute=None):
+    """Stage graph for the /api/ai video routes
+    
+    Whisper runs on a thread while PySceneDetect runs in a worker process; each GPT
+    stage starts as soon as the transcript (and scenes) it needs are ready. In combined
+    mode one GPT stage produces every feature from a single request.
+    """
+    pipeline = StagePipeline(admission=admission)
+    # WhisperService takes a "cpu" slot per decode and per chunk worker itself
+    pipeline.add_stage("transcribe", whisper_service.transcribe_video, args=(video_path, 'base'))
+    
+    if mode == 'combined':
+        deps = ["transcribe"]
+        if 'timestamps' in features:
+            add_scene_stages(pipeline, video_path, speed, scene_threshold, scenes_per_minute)
+            deps.append("scenes")
+        pipeline.add_stage(
+            "combined",
+            lambda transcript, scenes=None: gpt_service.generate_combined(
+                transcript["text"], video_title, scenes, segments=transcript.get("segments"), features=features
+            ),
+            deps=deps, resource="io"
+        )
+        for feature in ('summary', 'description'):
+            if feature in features:
+                pipeline.add_stage(feature, lambda combined, feature=feature: combined[feature], deps=["combined"])
+        if 'timestamps' in features:
+            pipeline.add_stage(
+                "timestamps",
+                lambda combined: combine_main_scene_descriptions(combined["main_scenes"], combined["scene_descriptions"]),
+                deps=["combined"]
+            )
+        return pipeline
+    
+    if 'summary' in features:
+        pipeline.add_stage(
+            "summary",
+            lambda transcript: gpt_service.generate_summary(
+                transcript["text"], video_title, segments=transcript.get("segments")
+            ),
+            deps=["transcribe"], resource="io"
+        )
+    
+    if 'description' in features:
+        pipeline.add_stage(
+            "description",
+            lambda transcript: gpt_service.generate_description(
+                transcript["text"], video_title, segments=transcript.get("segments")
+            ),
+            deps=["transcribe"], resource="io"
+        )
+    
+    if 'timestamps' in features:
+        add_scene_stages(pipeline, video_path, speed, scene_threshold, scenes_per_minute)
+        pipeline.add_stage(
+            "main_scenes",
+            lambda transcript, scenes: gpt_service.filter_main_scenes(scenes, transcript["text"], video_title),
+            deps=["transcribe", "scenes"], resource="io"
+        )
+        pipeline.add_stage(
+            "scene_descriptions",
+            lambda transcript, main_scenes: gpt_service.generate_scene_descriptions(
+                main_scenes, transcript["text"], video_title, segments=transcript.get("segments")
+            ),
+            deps=["transcribe", "main_scenes"], resource="io"
+        )
+        pipeline.add_stage(
+            "timestamps", combine_main_scene_descriptions,
+            deps=["main_scenes", "scene_descriptions"]
+        )
+    
+    return pipeline
+
+def run_video_pipeline(video_path, video_title, features, mode=None, completed=None, on_stage_complete=None,
+                       speed=None, scene_threshold=27.0, scenes_per_minute=None):
+    """Run the video pipeline and measure its GPT usage; returns (results, timings, gpt_usage)"""
+    mode = generation_mode(features, mode)
+    with measure_usage() as usage:
+        results, timings = build_video_pipeline(
+            video_path, video_title, features, mode, speed, scene_threshold, scenes_per_minute
+        ).run(
+            completed=completed, on_stage_complete=on_stage_complete
+        )
+    gpt_usage = dict(usage.summary(), mode=mode)
+    gpt_service.usage_report.add_run(mode, gpt_usage, timings["total"])
+    logger.info(f"GPT usage ({mode}): {gpt_usage['requests']} requests, {gpt_usage['total_tokens']} tokens, "
+                f"{timings['total']:.1f}s total")
+    return results, timings, gpt_usage
+
 @app.route('/api/ai/generate-timestamps', methods=['POST'])
+@admission_controlled('cpu', 'io')
 def generate_timestamps_from_video_id():
     """Generate timestamps from video ID (for existing videos)"""
     try:
         data = request.get_json()
         video_id = data.get('videoId')
         video_title = data.get('videoTitle', '')
+        speed = data.get('speed')
         
         if not video_id:
             return jsonify({"error": "No video ID provided"}), 400
+        if unknown_speed(speed):
+            return unknown_speed_response(speed)
+        try:
+            scene_threshold = parse_scene_threshold(data.get('sceneThreshold'))
+        except ValueError:
+            return invalid_threshold_response(data.get('sceneThreshold'))
+        try:
+            scenes_per_minute = parse_scenes_per_minute(data.get('scenesPerMinute'))
+        except ValueError:
+            return invalid_scenes_per_minute_response(data.get('scenesPerMinute'))
         
-        # Get video from database
-        video_data = get_video_from_database(video_id)
+        # Get video metadata and file path (cached while the file is unchanged)
+        video_data, video_path = resolve_video(video_id)
         if not video_data:
             return jsonify({"error": "Video not found"}), 404
         
-        # Get video file path
-        video_path = get_video_file_path(video_data)
         if not video_path:
             return jsonify({"error": "Video file not found"}), 404
         
-        # Extract audio and transcribe
+        # Transcription and scene detection run concurrently, then GPT filters and describes
         logger.info(f"Processing video {video_id} for timestamps generation...")
-        audio_path = video_processor.extract_audio_from_video(video_path)
-        
-        # Transcribe with Whisper
-        logger.info("Transcribing audio with Whisper...")
-        model = whisper.load_model('base')
-        transcript_result = model.transcribe(audio_path)
-        transcript = transcript_result["text"]
-        
-        # Detect scenes with PySceneDetect (more accurate timestamps)
-        logger.info("Detecting scenes with PySceneDetect...")
-        scene_timestamps = scene_detector.detect_scenes(video_path, threshold=27.0, min_scene_length=1.0)
-        
-        # Filter to only include main/important scenes using GPT
-        logger.info("Filtering to main scenes using GPT...")
-        main_scenes = gpt_service.filter_main_scenes(scene_timestamps, transcript, video_title)
-        
-        # Generate descriptions for main scenes using GPT
-        logger.info("Generating descriptions for main scenes with GPT...")
-        scene_descriptions = gpt_service.generate_scene_descriptions(main_scenes, transcript, video_title)
-        
-        # Combine PySceneDetect timestamps with GPT descriptions
-        logger.info("Combining main scene timestamps with GPT descriptions...")
-        final_timestamps = []
-        
-        for i, scene_ts in enumerate(main_scenes):
-            # Find matching GPT description
-            matching_description = None
-            for desc in scene_descriptions:
-                if desc["scene_index"] == i:
-                    matching_description = desc["description"]
-                    break
-            
-            # Use GPT description if available, otherwise use scene description
-            description = matching_description if matching_description else scene_ts["description"]
-            
-            final_timestamps.append({
-                "time_start": scene_ts["time_start"],
-                "description": description,
-                "scene_info": f"Main Scene {i+1}",
-                "duration": scene_ts["duration"]
-            })
-        
-        # Clean up audio file
-        video_processor.cleanup_files(None, audio_path)
+        results, timings, gpt_usage = coalesce(
+            video_flight_key('process-video', video_id, video_title, ['timestamps'], None, speed,
+                             scene_threshold, scenes_per_minute),
+            lambda: run_video_pipeline(video_path, video_title, ['timestamps'], speed=speed,
+                                       scene_threshold=scene_threshold, scenes_per_minute=scenes_per_minute)
+        )
         
-        return jsonify({"timestamps": final_timestamps})
+        return jsonify({
+            "timestamps": results["timestamps"],
+            "scene_threshold": scene_threshold_used(results, scene_threshold),
+            "timings": timings,
+            "gpt_usage": gpt_usage
+        })
         
     except Exception as e:
         logger.error(f"Error generating timestamps: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/ai/process-video', methods=['POST'])
+@admission_controlled('cpu', 'io')
 def process_video_sequential():
-    """Process video sequentially - summary, description, timestamps"""
+    """Process video - summary, description, timestamps (independent stages run in parallel)"""
     try:
         data = request.get_json()
         video_id = data.get('videoId')
         video_title = data.get('videoTitle', '')
         features = data.get('features', ['summary', 'description', 'timestamps'])
+        mode = data.get('mode', GENERATION_MODE)
+        speed = data.get('speed')
         
         if not video_id:
             return jsonify({"error": "No video ID provided"}), 400
+        if unknown_speed(speed):
+            return unknown_speed_response(speed)
+        try:
+            scene_threshold = parse_scene_threshold(data.get('sceneThreshold'))
+        except ValueError:
+            return invalid_threshold_response(data.get('sceneThreshold'))
+        try:
+            scenes_per_minute = parse_scenes_per_minute(data.get('scenesPerMinute'))
+        except ValueError:
+            return invalid_scenes_per_minute_response(data.get('scenesPerMinute'))
         
-        # Get video from database
-        video_data = get_video_from_database(video_id)
+        # Get video metadata and file path (cached while the file is unchanged)
+        video_data, video_path = resolve_video(video_id)
         if not video_data:
             return jsonify({"error": "Video not found"}), 404
         
-        # Get video file path
-        video_path = get_video_file_path(video_data)
         if not video_path:
             return jsonify({"error": "Video file not found"}), 404
         
+        logger.info(f"Processing video {video_id} for AI generation...")
+        results, timings, gpt_usage = coalesce(
+            video_flight_key('process-video', video_id, video_title, features, mode, speed,
+                             scene_threshold, scenes_per_minute),
+            lambda: run_video_pipeline(video_path, video_title, features, mode, speed=speed,
+                                       scene_threshold=scene_threshold, scenes_per_minute=scenes_per_minute)
+        )
+        
         result = {
-            "summary": None,
-            "description": None,
-            "timestamps": None
+            "summary": results.get("summary"),
+            "description": results.get("description"),
+            "timestamps": results.get("timestamps"),
+            "scene_threshold": scene_threshold_used(results, scene_threshold) if 'timestamps' in features else None,
+            "timings": timings,
+            "gpt_usage": gpt_usage
         }
         
-        # Extract audio and transcribe once
-        logger.info(f"Processing video {video_id} for AI generation...")
-        audio_path = video_processor.extract_audio_from_video(video_path)
+        return jsonify(result)
         
-        # Transcribe with Whisper
-        logger.info("Transcribing audio with Whisper...")
-        model = whisper.load_model('base')
-        transcript_result = model.transcribe(audio_path)
-        transcript = transcript_result["text"]
+    except Exception as e:
+        logger.error(f"Error processing video: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def run_video_processing_job(job):
+    """Job handler: the /api/ai/process-video pipeline, resuming after any stages already stored"""
+    params = job.params
+    if not params.get('videoId') or not params.get('features'):
+        raise NonRetryableJobError("Job needs a videoId and features")
+    if unknown_speed(params.get('speed')):
+        raise NonRetryableJobError(f"Unknown scene detection speed: {params.get('speed')}")
+    
+    video_data, video_path = resolve_video(params['videoId'])
+    if not video_data:
+        raise NonRetryableJobError("Video not found")
+    
+    if not video_path:
+        raise NonRetryableJobError("Video file not found")
+    
+    mode = generation_mode(params['features'], params.get('mode'))
+    speed = params.get('speed')
+    # Jobs queued before scene thresholds were configurable have neither key
+    scene_threshold = params.get('sceneThreshold', 27.0)
+    scenes_per_minute = params.get('scenesPerMinute')
+    total_stages = len(build_video_pipeline(
+        video_path, params.get('videoTitle', ''), params['features'], mode, speed, scene_threshold, scenes_per_minute
+    ).stages)
+    results, timings, gpt_usage = run_video_pipeline(
+        video_path, params.get('videoTitle', ''), params['features'], mode,
+        completed=job.completed_stages,
+        on_stage_complete=lambda stage, result, seconds: job.record_stage(stage, result, seconds, total_stages),
+        speed=speed, scene_threshold=scene_threshold, scenes_per_minute=scenes_per_minute
+    )
+    
+    return {
+        "summary": results.get("summary"),
+        "description": results.get("description"),
+        "timestamps": results.get("timestamps"),
+        "scene_threshold": scene_threshold_used(results, scene_threshold) if 'timestamps' in params['features'] else None,
+        "timings": timings,
+        "gpt_usage": gpt_usage
+    }
+
+@app.route('/api/ai/videos/resolve', methods=['POST'])
+def resolve_videos_route():
+    """Resolve many video ids to metadata and file paths at once (warms the metadata cache for backfills)"""
+    try:
+        data = request.get_json() or {}
+        video_ids = data.get('videoIds')
+        
+        if not isinstance(video_ids, list) or not video_ids:
+            return jsonify({"error": "videoIds must be a non-empty list"}), 400
+        
+        resolved = resolve_videos([str(video_id) for video_id in video_ids])
+        videos = {
+            video_id: {
+                "found": bool(video_data and video_path),
+                "title": (video_data or {}).get('title'),
+                "video_path": video_path
+            }
+            for video_id, (video_data, video_path) in resolved.items()
+        }
         
-        # Generate features sequentially
-        if 'summary' in features:
-            logger.info("Generating summary...")
-            result["summary"] = gpt_service.generate_summary(transcript, video_title)
+        return jsonify({
+            "videos": videos,
+            "resolved": sum(1 for video in videos.values() if video["found"]),
+            "requested": len(videos)
+        })
         
-        if 'description' in features:
-            logger.info("Generating description...")
-            result["description"] = gpt_service.generate_description(transcript, video_title)
+    except Exception as e:
+        logger.error(f"Error resolving videos: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/ai/jobs', methods=['POST'])
+def create_job():
+    """Queue AI processing for a video and return a job ID immediately"""
+    try:
+        data = request.get_json()
+        video_id = data.get('videoId')
+        video_title = data.get('videoTitle', '')
+        features = data.get('features', ['summary', 'description', 'timestamps'])
+        speed = data.get('speed')
         
-        if 'timestamps' in features:
-            logger.info("Generating timestamps...")
-            # Detect scenes with PySceneDetect
-            scene_timestamps = scene_detector.detect_scenes(video_path, threshold=27.0, min_scene_length=1.0)
-            
-            # Filter to main scenes
-            main_scenes = gpt_service.filter_main_scenes(scene_timestamps, transcript, video_title)
-            
-            # Generate descriptions for main scenes
-            scene_descriptions = gpt_service.generate_scene_descriptions(main_scenes, transcript, video_title)
-            
-            # Combine timestamps with descriptions
-            final_timestamps = []
-            for i, scene_ts in enumerate(main_scenes):
-                matching_description = None
-                for desc in scene_descriptions:
-                    if desc["scene_index"] == i:
-                        matching_description = desc["description"]
-                        break
-                
-                description = matching_description if matching_description else scene_ts["description"]
-                
-                final_timestamps.append({
-                    "time_start": scene_ts["time_start"],
-                    "description": description,
-                    "scene_info": f"Main Scene {i+1}",
-                    "duration": scene_ts["duration"]
-                })
-            
-            result["timestamps"] = final_timestamps
+        if not video_id:
+            return jsonify({"error": "No video ID provided"}), 400
+        if unknown_speed(speed):
+            return unknown_speed_response(speed)
+        try:
+            scene_threshold = parse_scene_threshold(data.get('sceneThreshold'))
+        except ValueError:
+            return invalid_threshold_response(data.get('sceneThreshold'))
+        try:
+            scenes_per_minute = parse_scenes_per_minute(data.get('scenesPerMinute'))
+        except ValueError:
+            return invalid_scenes_per_minute_response(data.get('scenesPerMinute'))
+        
+        # An identical job that is still queued or running is reused instead of queued again
+        job_id = job_manager.submit('process-video', {
+            "videoId": video_id,
+            "videoTitle": video_title,
+            "features": sorted(features),
+            "mode": data.get('mode', GENERATION_MODE),
+            "speed": speed,
+            "sceneThreshold": scene_threshold,
+            "scenesPerMinute": scenes_per_minute
+        })
+        job = job_manager.get(job_id)
         
-        # Clean up audio file
-        video_processor.cleanup_files(None, audio_path)
+        return jsonify({
+            "job_id": job_id,
+            "status": job["status"],
+            "status_url": f"/api/ai/jobs/{job_id}"
+        }), 202
         
-        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error creating job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/ai/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return job status, progress and (when finished) results"""
+    try:
+        job = job_manager.get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        
+        return jsonify({
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "progress": job["progress"],
+            "stages_completed": job["stages"],
+            "attempts": job["attempts"],
+            "result": job["result"],
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "finished_at": job["finished_at"]
+        })
         
     except Exception as e:
-        logger.error(f"Error processing video: {str(e)}")
+        logger.error(f"Error fetching job: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/ai/test-video/<video_id>', methods=['GET'])
 def test_video_access(video_id):
     """Test if video is accessible"""
     try:
-        video_data = get_video_from_database(video_id)
+        video_data, video_path = resolve_video(video_id)
         if not video_data:
             return jsonify({"error": "Video not found"}), 404
         
-        video_path = get_video_file_path(video_data)
         if not video_path:
             return jsonify({"error": "Video file not found"}), 404
         
@@ -786,12 +1391,62 @@ def test_video_access(video_id):
         logger.error(f"Error testing video access: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/ai/transcripts/invalidate', methods=['POST'])
+def invalidate_transcripts():
+    """Drop cached transcripts for a video whose file was replaced"""
+    try:
+        data = request.get_json()
+        video_id = data.get('videoId')
+        
+        if not video_id:
+            return jsonify({"error": "No video ID provided"}), 400
+        
+        # The file was replaced, so resolve it afresh as well
+        video_metadata_cache.invalidate(video_id)
+        video_data, video_path = resolve_video(video_id)
+        if not video_data:
+            return jsonify({"error": "Video not found"}), 404
+        
+        if not video_path:
+            return jsonify({"error": "Video file not found"}), 404
+        
+        removed = whisper_service.transcript_cache.invalidate(video_path)
+        
+        return jsonify({"video_id": video_id, "removed": removed})
+        
+    except Exception as e:
+        logger.error(f"Error invalidating transcripts: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Background workers for /api/ai/jobs
+job_manager = JobManager(JobStore(), {'process-video': run_video_processing_job})
+
+def start_job_workers():
+    """Start the job workers in the process that serves requests
+    
+    Not at import: spawned pool workers re-import this module as __mp_main__, and the
+    debug reloader's parent only watches files; neither may claim jobs.
+    """
+    if __name__ == '__mp_main__':
+        return
+    job_manager.start()
+
+@app.before_request
+def ensure_job_workers():
+    # Also covers WSGI servers, which import the app without running __main__
+    start_job_workers()
+
 if __name__ == '__main__':
     # Create upload directory
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     
     # Check if OpenAI API key is set
-    if not os.getenv('OPENAI_API_KEY'):
+    if not os.getenv('OPENAI_API_KEY') and not os.getenv('OPENAI_BASE_URL'):
         logger.warning("OPENAI_API_KEY environment variable not set!")
     
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Pick up queued jobs without waiting for the first request
+        start_job_workers()
+    
+    app.run(host='0.0.0.0', port=5001, debug=debug)
@@ -0,0 +1,221 @@
+import os
+import math
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# CPU stages one request runs at the same time (the pipeline's transcription and scene detection)
+REQUEST_CPU_STAGES = 2
+# ffmpeg, Whisper and PySceneDetect: bounded by cores and RAM, but never below one request's own
+# concurrent stages, which would otherwise wait for each other
+CPU_CONCURRENCY = int(os.getenv(
+    'ADMISSION_CPU_CONCURRENCY', str(max(REQUEST_CPU_STAGES, min(4, (os.cpu_count() or 2) // 2)))
+))
+# GPT calls and Node lookups: mostly waiting on the network
+IO_CONCURRENCY = int(os.getenv('ADMISSION_IO_CONCURRENCY', '8'))
+# Admitted requests allowed to wait for a slot before new ones are turned away
+CPU_QUEUE_LIMIT = int(os.getenv('ADMISSION_CPU_QUEUE', '4'))
+IO_QUEUE_LIMIT = int(os.getenv('ADMISSION_IO_QUEUE', '32'))
+# Free memory a CPU stage needs before it may start (roughly one Whisper base model plus decoded audio)
+MIN_FREE_MEMORY_MB = float(os.getenv('ADMISSION_MIN_FREE_MEMORY_MB', '1024'))
+MEMORY_POLL_SECONDS = 1.0
+
+
+def available_memory_mb():
+    """Memory the OS can hand out without swapping, or None if it cannot be determined"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class AdmissionRejected(Exception):
+    """The service is saturated; carries the hint returned to the client"""
+
+    def __init__(self, pool, reason, retry_after, queue_position):
+        super().__init__(f"{pool} capacity exhausted: {reason}")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+        self.queue_position = queue_position
+
+
+class Admission:
+    """An admitted request's reservation; release it (or leave the with block) when the request ends"""
+
+    def __init__(self, pools, queue_position):
+        self.pools = pools
+        self.queue_position = queue_position
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            for pool in self.pools:
+                pool.leave()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ResourcePool:
+    """Concurrency limit for one class of stages, with a FIFO wait queue
+
+    Requests are admitted up to limit + queue_limit at a time; each stage they run
+    then waits for one of the limit slots. min_free_mb makes a slot also wait for
+    memory headroom, unless nothing else in the pool is running.
+    """
+
+    def __init__(self, name, limit, queue_limit, min_free_mb=None, expected_seconds=30.0):
+        self.name = name
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.min_free_mb = min_free_mb
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_seconds = expected_seconds  # moving average of slot hold time, for Retry-After
+        self._waiting = deque()
+        self._cond = threading.Condition()
+
+    def _memory_ok(self, min_free_mb=None):
+        min_free_mb = min_free_mb or self.min_free_mb
+        if min_free_mb is None:
+            return True
+        free = available_memory_mb()
+        return free is None or free >= min_free_mb
+
+    def _estimate_wait(self, position):
+        return max(1, int(math.ceil(self.avg_seconds * math.ceil(position / self.limit))))
+
+    def admit(self):
+        """Reserve a place for a request; returns its queue position (0 = can start now)"""
+        with self._cond:
+            backlog = self.admitted - self.limit
+            if self.admitted >= self.limit + self.queue_limit:
+                self.rejected += 1
+                position = backlog + 1
+                raise AdmissionRejected(self.name, "queue full", self._estimate_wait(position), position)
+            if self.active > 0 and not self._memory_ok():
+                self.rejected += 1
+                position = max(1, backlog + 1)
+                raise AdmissionRejected(self.name, "low memory", self._estimate_wait(position), position)
+            self.admitted += 1
+            return max(0, backlog + 1)
+
+    def leave(self):
+        with self._cond:
+            self.admitted -= 1
+
+    @contextmanager
+    def slot(self, min_free_mb=None):
+        """Hold one of the pool's slots for the duration of a stage
+
+        min_free_mb replaces the pool's memory floor for a stage that needs more,
+        e.g. one that loads its own Whisper model.
+        """
+        ticket = object()
+        with self._cond:
+            self._waiting.append(ticket)
+            while not (self._waiting[0] is ticket and self.active < self.limit
+                       and (self.active == 0 or self._memory_ok(min_free_mb))):
+                # Memory is polled, so wake up periodically even without a release
+                self._cond.wait(MEMORY_POLL_SECONDS)
+            self._waiting.popleft()
+            self.active += 1
+            self._cond.notify_all()
+        started = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - started
+            with self._cond:
+                self.active -= 1
+                self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * elapsed
+                self._cond.notify_all()
+
+    @contextmanager
+    def idle_slot(self):
+        """Take a slot only if one is free right now and nobody is waiting; yields whether it was taken
+
+        For optional background work: it never queues, so it cannot delay or crowd out requests.
+        """
+        with self._cond:
+            taken = not self._waiting and self.active < self.limit and self._memory_ok()
+            if taken:
+                self.active += 1
+        try:
+            yield taken
+        finally:
+            if taken:
+                with self._cond:
+                    self.active -= 1
+                    self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "active": self.active,
+                "waiting": len(self._waiting),
+                "admitted": self.admitted,
+                "queue_limit": self.queue_limit,
+                "rejected": self.rejected,
+                "avg_seconds": round(self.avg_seconds, 2)
+            }
+
+
+class AdmissionController:
+    """Separate pools for CPU-heavy stages (ffmpeg, Whisper, scene detection) and I/O stages (GPT, Node)"""
+
+    def __init__(self, cpu_limit=CPU_CONCURRENCY, io_limit=IO_CONCURRENCY,
+                 cpu_queue=CPU_QUEUE_LIMIT, io_queue=IO_QUEUE_LIMIT, min_free_mb=MIN_FREE_MEMORY_MB):
+        self.pools = {
+            "cpu": ResourcePool("cpu", cpu_limit, cpu_queue, min_free_mb=min_free_mb, expected_seconds=60.0),
+            "io": ResourcePool("io", io_limit, io_queue, expected_seconds=5.0)
+        }
+
+    def admit(self, *pool_names):
+        """Admit a request needing the given pools, or raise AdmissionRejected"""
+        entered = []
+        try:
+            position = 0
+            for name in pool_names:
+                position = max(position, self.pools[name].admit())
+                entered.append(self.pools[name])
+        except AdmissionRejected as e:
+            for pool in entered:
+                pool.leave()
+            logger.warning(f"Rejected request: {e} (retry after {e.retry_after}s)")
+            raise
+        if position:
+            logger.info(f"Admitted request at queue position {position}")
+        return Admission(entered, position)
+
+    def slot(self, pool_name, min_free_mb=None):
+        return self.pools[pool_name].slot(min_free_mb)
+
+    def idle_slot(self, pool_name):
+        return self.pools[pool_name].idle_slot()
+
+    def stats(self):
+        return {
+            "pools": {name: pool.stats() for name, pool in self.pools.items()},
+            "available_memory_mb": available_memory_mb()
+        }
@@ -0,0 +1,51 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024  # 1MB reads keep memory flat for large videos
+# Every upload gets a unique path, so the memo is an LRU rather than growing with each one
+MEMO_MAX_ENTRIES = int(os.getenv('FILE_HASH_MEMO_MAX_ENTRIES', '1024'))
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def hash_file(path):
+    """Return the SHA-256 of a file's bytes, memoised on (path, size, mtime)"""
+    abs_path = os.path.abspath(path)
+    signature = _file_signature(abs_path)
+
+    with _memo_lock:
+        cached = _memo.get(abs_path)
+        if cached and cached[0] == signature:
+            _memo.move_to_end(abs_path)
+            return cached[1]
+
+    digest = hashlib.sha256()
+    with open(abs_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    file_hash = digest.hexdigest()
+
+    with _memo_lock:
+        _memo[abs_path] = (signature, file_hash)
+        _memo.move_to_end(abs_path)
+        while len(_memo) > MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+    return file_hash
+
+
+def forget_file(path):
+    """Drop the memoised hash for a path and return it (None if it was never hashed)"""
+    with _memo_lock:
+        cached = _memo.pop(os.path.abspath(path), None)
+    return cached[1] if cached else None
@@ -0,0 +1,92 @@
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+def _counting_pool(pool_class, on_new_connection):
+    """pool_class that reports every connection it opens"""
+    class CountingPool(pool_class):
+        def _new_conn(self):
+            on_new_connection()
+            return super()._new_conn()
+    return CountingPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter counting opened connections; unlike the pools' own counts this survives pool eviction"""
+
+    def __init__(self, on_new_connection, **kwargs):
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _counting_pool(pool_class, self._on_new_connection)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+class PooledSession(requests.Session):
+    """Keep-alive session with a bounded connection pool and a default (connect, read) timeout
+
+    One instance is shared by all threads talking to the same service, so requests after
+    the first reuse an open connection instead of paying TCP/TLS setup. stats() reports
+    how many requests went out and how many connections had to be opened for them.
+    
+    close() is a no-op because the instance is shared: openai 0.28 closes each thread's
+    session once it is 180s old, which would drop every thread's pooled connections.
+    shutdown() really closes it.
+    """
+
+    def __init__(self, name, pool_size=10, connect_timeout=5.0, read_timeout=30.0):
+        super().__init__()
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        # Connection errors are retried by the callers, which know what is safe to repeat
+        self.requests = 0
+        self.failures = 0
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+        adapter = _CountingAdapter(self._connection_opened, pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        with self._lock:
+            self.requests += 1
+        try:
+            return super().request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.failures += 1
+            raise
+
+    def _connection_opened(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def close(self):
+        logger.debug(f"Ignoring close() of shared session '{self.name}'")
+
+    def shutdown(self):
+        super().close()
+
+    def stats(self):
+        with self._lock:
+            requests_sent, failures, opened = self.requests, self.failures, self.connections_opened
+        reused = max(0, requests_sent - failures - opened)
+        return {
+            "requests": requests_sent,
+            "failures": failures,
+            "connections_opened": opened,
+            "connections_reused": reused,
+            "reuse_rate": round(reused / requests_sent, 3) if requests_sent else 0.0,
+            "timeout_seconds": {"connect": self.timeout[0], "read": self.timeout[1]}
+        }
+
@@ -0,0 +1,133 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESS_WORKERS = int(os.getenv('PIPELINE_PROCESS_WORKERS', '2'))
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Shared pool for CPU-bound stages that must not hold the GIL (e.g. scene detection)"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=DEFAULT_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+
+class StageError(Exception):
+    """A pipeline stage failed; carries the stage name"""
+
+    def __init__(self, stage, error):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Stage:
+    def __init__(self, name, func, deps=(), args=(), kwargs=None, in_process=False, resource=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        self.in_process = in_process
+        self.resource = resource
+
+
+class StagePipeline:
+    """Run a small DAG of stages, starting each one as soon as its dependencies finish
+
+    A stage is called as func(*args, *dependency_results, **kwargs). Stages marked
+    in_process run in the shared process pool, so their func and arguments must be
+    picklable; all others run on a thread pool. A stage with a resource first waits
+    for a slot in that pool of the admission controller.
+    """
+
+    def __init__(self, max_threads=4, admission=None):
+        self.max_threads = max_threads
+        self.admission = admission
+        self.stages = {}
+
+    def add_stage(self, name, func, deps=(), args=(), kwargs=None, in_process=False, resource=None):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = Stage(name, func, deps, args, kwargs, in_process, resource)
+        return self
+
+    def _call_with_slot(self, stage, call_args):
+        with self.admission.slot(stage.resource):
+            if stage.in_process:
+                return get_process_pool().submit(stage.func, *call_args, **stage.kwargs).result()
+            return stage.func(*call_args, **stage.kwargs)
+
+    def run(self, completed=None, on_stage_complete=None):
+        """Execute all stages and return (results, timings)
+
+        completed: results of stages already finished earlier; they are not re-run.
+        on_stage_complete: called as (name, result, seconds) after each stage.
+        """
+        results = dict(completed or {})
+        timings = {}
+        pending = {name: stage for name, stage in self.stages.items() if name not in results}
+        running = {}
+        started = time.time()
+
+        threads = ThreadPoolExecutor(max_workers=self.max_threads)
+        try:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in results for dep in stage.deps):
+                        call_args = stage.args + tuple(results[dep] for dep in stage.deps)
+                        logger.info(f"Starting stage '{name}'")
+                        # Thread stages run in a copy of the caller's context (e.g. its GPT usage meter)
+                        context = contextvars.copy_context()
+                        if stage.resource and self.admission:
+                            # Waiting for the slot happens on a thread so other stages keep starting
+                            future = threads.submit(context.run, self._call_with_slot, stage, call_args)
+                        elif stage.in_process:
+                            future = get_process_pool().submit(stage.func, *call_args, **stage.kwargs)
+                        else:
+                            future = threads.submit(context.run, stage.func, *call_args, **stage.kwargs)
+                        running[future] = (name, time.time())
+                        del pending[name]
+
+                if not running:
+                    raise ValueError(f"Stages can never run (dependency cycle?): {sorted(pending)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, stage_started = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        for other in running:
+                            other.cancel()
+                        logger.error(f"Stage '{name}' failed: {str(e)}")
+                        raise StageError(name, e) from e
+
+                    elapsed = time.time() - stage_started
+                    results[name] = result
+                    timings[name] = round(elapsed, 3)
+                    logger.info(f"Stage '{name}' finished in {elapsed:.2f}s")
+                    if on_stage_complete:
+                        on_stage_complete(name, result, elapsed)
+        finally:
+            # On failure, stages still running (e.g. Whisper) finish in the background instead
+            # of holding up the error
+            threads.shutdown(wait=not running, cancel_futures=True)
+
+        timings["total"] = round(time.time() - started, 3)
+        return results, timings
@@ -0,0 +1,39 @@
+from bisect import bisect_left, bisect_right
+
+
+class TranscriptIndex:
+    """Time index over Whisper segments for exact text lookups by time range
+
+    Uses word timings when every segment has them (word_timestamps=True), otherwise
+    whole segments. A range query is two bisections plus the matching entries.
+    """
+
+    def __init__(self, segments):
+        segments = [seg for seg in segments or [] if isinstance(seg, dict) and 'start' in seg and 'end' in seg]
+        use_words = bool(segments) and all(seg.get('words') for seg in segments)
+        units = [word for seg in segments for word in seg['words']] if use_words else segments
+        key = 'word' if use_words else 'text'
+
+        entries = sorted((float(u['start']), float(u['end']), u.get(key, '').strip()) for u in units)
+        self.starts = [start for start, _, _ in entries]
+        self.ends = [end for _, end, _ in entries]
+        self.texts = [text for _, _, text in entries]
+        # Running maximum of end times keeps the lower bisection valid if entries overlap
+        self._max_ends = []
+        running = float('-inf')
+        for end in self.ends:
+            running = max(running, end)
+            self._max_ends.append(running)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def range(self, start, end):
+        """Indexes of the entries overlapping [start, end)"""
+        lo = bisect_right(self._max_ends, start)
+        hi = bisect_left(self.starts, end)
+        return [i for i in range(lo, hi) if self.ends[i] > start]
+
+    def text(self, start, end):
+        """Transcript text spoken in [start, end)"""
+        return ' '.join(self.texts[i] for i in self.range(start, end) if self.texts[i])
@@ -0,0 +1,87 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = float(os.getenv('VIDEO_METADATA_TTL_SECONDS', '300'))
+DEFAULT_MAX_ENTRIES = int(os.getenv('VIDEO_METADATA_MAX_ENTRIES', '1024'))
+
+
+class VideoMetadataCache:
+    """In-memory videoId -> (video metadata, absolute file path) with a TTL
+
+    An entry is only served while its file still has the size and mtime it had when
+    the entry was stored, so a replaced or deleted upload is looked up again. A hit
+    costs one stat() and no Node.js round trip or path probing.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @staticmethod
+    def _file_signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, video_id):
+        """(video_data, video_path) when cached and the file is unchanged, else None"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+        if entry is not None:
+            video_data, video_path, signature, expires_at = entry
+            if time.time() < expires_at and self._file_signature(video_path) == signature:
+                with self._lock:
+                    self._entries.move_to_end(video_id)
+                    self.hits += 1
+                return video_data, video_path
+            with self._lock:
+                if self._entries.get(video_id) is entry:
+                    del self._entries[video_id]
+                self.stale += 1
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, video_id, video_data, video_path):
+        signature = self._file_signature(video_path)
+        if signature is None:
+            return
+        with self._lock:
+            self._entries[video_id] = (video_data, video_path, signature, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, video_id=None):
+        """Drop one video (or everything); returns how many entries were removed"""
+        with self._lock:
+            if video_id is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            return 1 if self._entries.pop(video_id, None) is not None else 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
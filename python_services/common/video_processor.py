@@ -1,10 +1,16 @@
 import os
+import uuid
 import subprocess
 import logging
+import numpy as np
 from werkzeug.utils import secure_filename
+from common.file_hash import forget_file
 
 logger = logging.getLogger(__name__)
 
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_BLOCK_SECONDS = 30
+
 class VideoProcessor:
     def __init__(self):
         self.allowed_extensions = {'mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm'}
@@ -50,10 +56,78 @@ class VideoProcessor:
             logger.error(f"Error extracting audio: {str(e)}")
             raise
     
+    def _pcm_command(self, video_path, sample_rate):
+        return [
+            'ffmpeg', '-nostdin', '-i', video_path,
+            '-vn',  # No video
+            '-acodec', 'pcm_s16le',  # PCM 16-bit
+            '-ar', str(sample_rate),
+            '-ac', '1',  # Mono
+            '-loglevel', 'error',
+            '-f', 's16le',  # Raw samples, no container
+            'pipe:1'
+        ]
+    
+    def load_audio(self, video_path, sample_rate=AUDIO_SAMPLE_RATE):
+        """Decode the audio track straight into a float32 NumPy array (no temporary WAV)"""
+        try:
+            result = subprocess.run(self._pcm_command(video_path, sample_rate), capture_output=True)
+            
+            if result.returncode != 0:
+                logger.error(f"FFmpeg error: {result.stderr.decode('utf-8', 'replace')}")
+                raise Exception("Failed to extract audio from video")
+            
+            return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+        except Exception as e:
+            logger.error(f"Error extracting audio: {str(e)}")
+            raise
+    
+    def iter_audio_blocks(self, video_path, sample_rate=AUDIO_SAMPLE_RATE, block_seconds=AUDIO_BLOCK_SECONDS):
+        """Yield the audio track as float32 blocks so very long files never sit in memory whole"""
+        block_bytes = int(sample_rate * block_seconds) * 2
+        process = subprocess.Popen(
+            self._pcm_command(video_path, sample_rate),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                # An odd byte count can only happen on the final read
+                data = data[:len(data) - (len(data) % 2)]
+                yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+            
+            if process.wait() != 0:
+                logger.error(f"FFmpeg error: {process.stderr.read().decode('utf-8', 'replace')}")
+                raise Exception("Failed to extract audio from video")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+    
+    def get_duration(self, video_path):
+        """Return the container duration in seconds from ffprobe, or None if unknown"""
+        try:
+            cmd = [
+                'ffprobe', '-v', 'error',
+                '-show_entries', 'format=duration',
+                '-of', 'default=noprint_wrappers=1:nokey=1',
+                video_path
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                return None
+            return float(result.stdout.strip())
+        except Exception:
+            return None
+    
     def save_video_file(self, video_file, upload_folder):
         """Save uploaded video file"""
         try:
-            filename = secure_filename(video_file.filename)
+            # Unique prefix so concurrent uploads of the same filename don't overwrite each other
+            filename = f"{uuid.uuid4().hex[:8]}_{secure_filename(video_file.filename)}"
             video_path = os.path.join(upload_folder, filename)
             
             # Create upload directory if it doesn't exist
@@ -68,6 +142,8 @@ class VideoProcessor:
     def cleanup_files(self, *file_paths):
         """Clean up temporary files"""
         for file_path in file_paths:
+            if file_path:
+                forget_file(file_path)
             if file_path and os.path.exists(file_path):
                 try:
                     os.remove(file_path)
@@ -4,26 +4,71 @@ import logging
 import time
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+from gpt.rate_limiter import RateLimiter, estimate_tokens
+from gpt.response_cache import ResponseCache, fingerprint
+from gpt.transcript_summarizer import TranscriptSummarizer
+from gpt.usage import UsageReport, record_usage, bind_context
+from gpt.retry_policy import (
+    RetryPolicy, CircuitBreaker, CircuitOpenError, classify_error, FATAL, TRANSIENT, RATE_LIMITED
+)
+from common.transcript_index import TranscriptIndex
+from common.http_client import PooledSession
 
 logger = logging.getLogger(__name__)
 
+# Parallel chat completions per call of generate_scene_descriptions
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8'))
+# Batched scene descriptions: prompt token budget per request and hard cap on scenes per request
+SCENE_BATCH_TOKEN_BUDGET = int(os.getenv('OPENAI_SCENE_BATCH_TOKENS', '3000'))
+SCENE_BATCH_MAX_SCENES = int(os.getenv('OPENAI_SCENE_BATCH_MAX_SCENES', '20'))
+# Transcript characters sent per scene in a batched prompt
+SCENE_BATCH_SCENE_CHARS = 600
+# Combined generation: prompt tokens shared by all scene slices
+COMBINED_SCENE_TOKENS = int(os.getenv('OPENAI_COMBINED_SCENE_TOKENS', '2500'))
+# Alternative API endpoint, e.g. http://127.0.0.1:8001/v1 for the local stub server
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
+# Keep-alive connections shared by all API calls; the read timeout bounds a hung completion
+OPENAI_POOL_SIZE = int(os.getenv('OPENAI_POOL_SIZE', '16'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_READ_TIMEOUT = float(os.getenv('OPENAI_READ_TIMEOUT', '60'))
+
 class GPTService:
-    def __init__(self):
+    def __init__(self, response_cache=None):
+        # An OpenAI-compatible endpoint such as gpt/stub_server.py; a local one needs no key
+        self.base_url = OPENAI_BASE_URL or None
         self.api_key = os.getenv('OPENAI_API_KEY')
         if not self.api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is required")
+            if not self.base_url:
+                raise ValueError("OPENAI_API_KEY environment variable is required")
+            self.api_key = "local"
+        
+        self.request_timeout = (OPENAI_CONNECT_TIMEOUT, OPENAI_READ_TIMEOUT)
+        self.http_session = None
         
         # Check OpenAI library version and initialize accordingly
         try:
-            # Try new version (1.0.0+)
-            self.client = openai.OpenAI(api_key=self.api_key)
+            # Try new version (1.0.0+); its httpx client already pools connections.
+            # Retries are left to _make_api_call so they go through the retry policy and breaker
+            self.client = openai.OpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                timeout=openai.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+            )
             self.is_new_version = True
             logger.info("Using OpenAI library version 1.0.0+")
         except AttributeError:
-            # Fallback to old version (< 1.0.0)
+            # Fallback to old version (< 1.0.0), which otherwise builds a session per thread
             openai.api_key = self.api_key
+            if self.base_url:
+                openai.api_base = self.base_url
+            self.http_session = PooledSession("openai", pool_size=OPENAI_POOL_SIZE,
+                                              connect_timeout=OPENAI_CONNECT_TIMEOUT,
+                                              read_timeout=OPENAI_READ_TIMEOUT)
+            openai.requestssession = self.http_session
             self.is_new_version = False
             logger.info("Using OpenAI library version < 1.0.0")
+        if self.base_url:
+            logger.info(f"Using OpenAI-compatible API at {self.base_url}")
         
         # Use faster model for better performance
         self.model = "gpt-3.5-turbo"
@@ -31,15 +76,46 @@ class GPTService:
             "OPENAI_SYSTEM_PROMPT",
             "You are an expert educational summarizer. Write clear, concise summaries quickly."
         )
+        self.max_concurrency = DEFAULT_MAX_CONCURRENCY
+        self.rate_limiter = RateLimiter()
+        # Identical prompts (same transcript, model and settings) are answered from disk
+        self.response_cache = response_cache or ResponseCache()
+        self.summarizer = TranscriptSummarizer(self)
+        self.usage_report = UsageReport()
+        self.retry_policy = RetryPolicy()
+        # Stops calling the API for a while after repeated upstream failures
+        self.breaker = CircuitBreaker()
+
+    def http_stats(self):
+        """Connection reuse of the API session (the 1.0.0+ client pools internally and reports none)"""
+        if self.http_session is not None:
+            return self.http_session.stats()
+        return {"client": "httpx", "timeout_seconds": {"connect": self.request_timeout[0], "read": self.request_timeout[1]}}
 
     def _try_model(self, model_name=None, fallback_model=None):
         return "gpt-3.5-turbo"
 
-    def _make_api_call(self, messages, max_tokens, temperature=0.3, retries=2):
-        """Make API call with optimized retry logic for faster performance"""
+    def _make_api_call(self, messages, max_tokens, temperature=0.3, retries=None, response_format=None):
+        """Make API call, retrying by error class with jittered backoff behind the circuit breaker
+        
+        Raises CircuitOpenError without calling the API while the breaker is open.
+        """
+        retries = retries or self.retry_policy.max_attempts
+        extra = {"response_format": response_format} if response_format else {}
+        # Replies from another endpoint (the stub) never answer calls meant for the real API
+        cache_key = fingerprint(self.model, messages, max_tokens, temperature, base_url=self.base_url, **extra)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached OpenAI response")
+            record_usage(cached=True)
+            return cached
+        
         for attempt in range(retries):
+            self.breaker.before_call()
             try:
+                self.rate_limiter.acquire(estimate_tokens(messages, max_tokens))
                 logger.info(f"Making OpenAI API call (attempt {attempt + 1}/{retries})")
+                started = time.time()
                 
                 if self.is_new_version:
                     # New version syntax
@@ -47,36 +123,67 @@ class GPTService:
                         model=self.model,
                         messages=messages,
                         max_tokens=max_tokens,
-                        temperature=temperature
+                        temperature=temperature,
+                        **extra
                     )
-                    result = response.choices[0].message.content.strip()
+                    result = (response.choices[0].message.content or "").strip()
                 else:
                     # Old version syntax
                     response = openai.ChatCompletion.create(
                         model=self.model,
                         messages=messages,
                         max_tokens=max_tokens,
-                        temperature=temperature
+                        temperature=temperature,
+                        request_timeout=self.request_timeout,
+                        **extra
                     )
-                    result = response.choices[0].message.content.strip()
+                    result = (response.choices[0].message.content or "").strip()
                 
                 logger.info(f"API call successful on attempt {attempt + 1}")
+                self.breaker.record_success()
+                usage = getattr(response, "usage", None)
+                record_usage(
+                    prompt_tokens=getattr(usage, "prompt_tokens", None) or estimate_tokens(messages, 0),
+                    completion_tokens=getattr(usage, "completion_tokens", None) or len(result) // 4,
+                    seconds=time.time() - started
+                )
+                if result:
+                    self.response_cache.put(cache_key, result)
                 return result
                 
             except Exception as e:
-                logger.error(f"API call failed on attempt {attempt + 1}: {str(e)}")
-                if attempt == retries - 1:
-                    raise e
-                time.sleep(1)  
+                error_class = classify_error(e)
+                logger.error(f"API call failed on attempt {attempt + 1} ({error_class}): {str(e)}")
+                if error_class == FATAL:
+                    # Our request was wrong, not the upstream
+                    self.breaker.release_trial()
+                    raise
+                if error_class == TRANSIENT:
+                    self.breaker.record_failure()
+                else:
+                    # Throttling means the upstream is up; backoff handles it, the breaker should not
+                    self.breaker.release_trial()
+                if attempt + 1 >= retries or not self.retry_policy.should_retry(error_class, attempt):
+                    raise
+                delay = self.retry_policy.delay(attempt, e)
+                logger.info(f"Retrying OpenAI API call in {delay:.2f}s")
+                time.sleep(delay)
         return None
 
-    def generate_description(self, transcript, video_title=""):
+    def _local_description(self, transcript, video_title=""):
+        """Description built without the API (title plus opening sentence), used while the breaker is open"""
+        first_sentence = re.split(r'(?<=[.!?])\s+', transcript.strip(), maxsplit=1)[0] if transcript else ""
+        description = f"{video_title}: {first_sentence}" if video_title and first_sentence else (video_title or first_sentence)
+        description = description or "Educational video"
+        return description[:117] + "..." if len(description) > 120 else description
+
+    def generate_description(self, transcript, video_title="", segments=None):
         """Generate a short, concise description using GPT - Optimized for speed"""
         try:
             logger.info("Starting description generation...")
             
-            # Truncate transcript for faster processing (first 1000 chars)
-            short_transcript = transcript[:1000] + "..." if len(transcript) > 1000 else transcript
+            # Long transcripts are condensed with map-reduce so the whole video is covered
+            short_transcript = self.summarizer.condense(transcript, segments, video_title)
             
             prompt = f"""
             Create a short description for this educational video.
@@ -96,7 +203,14 @@ class GPTService:
                 {"role": "user", "content": prompt}
             ]
             
-            description = self._make_api_call(messages, max_tokens=150, temperature=0.3)
+            try:
+                description = self._make_api_call(messages, max_tokens=150, temperature=0.3)
+            except Exception as e:
+                # Only an unavailable upstream (breaker open, retries used up) gets the fallback
+                if not isinstance(e, CircuitOpenError) and classify_error(e) not in (TRANSIENT, RATE_LIMITED):
+                    raise
+                logger.warning(f"OpenAI unavailable ({str(e)}), using local fallback description")
+                return self._local_description(transcript, video_title)
             
             if len(description) > 120:
                 description = description[:117] + "..."
@@ -108,13 +222,13 @@ class GPTService:
             logger.error(f"Error generating description: {str(e)}")
             raise Exception(f"Failed to generate description: {str(e)}")
 
-    def generate_summary(self, transcript, video_title=""):
+    def generate_summary(self, transcript, video_title="", segments=None):
         """Generate summary using GPT - Optimized for speed"""
         try:
             logger.info("Starting summary generation...")
             
-            # Truncate transcript for faster processing (first 2000 chars)
-            short_transcript = transcript[:2000] + "..." if len(transcript) > 2000 else transcript
+            # Long transcripts are condensed with map-reduce so the whole video is covered
+            short_transcript = self.summarizer.condense(transcript, segments, video_title)
             
             prompt = f"""
             Create a concise summary for this educational video.
@@ -143,13 +257,13 @@ class GPTService:
             logger.error(f"Error generating summary: {str(e)}")
             raise Exception(f"Failed to generate summary: {str(e)}")
 
-    def generate_timestamps(self, transcript, video_title=""):
+    def generate_timestamps(self, transcript, video_title="", segments=None):
         """Generate timestamps using GPT - Optimized for speed"""
         try:
             logger.info("Starting timestamps generation...")
             
-            # Truncate transcript for faster processing (first 1500 chars)
-            short_transcript = transcript[:1500] + "..." if len(transcript) > 1500 else transcript
+            # Long transcripts are condensed into notes that keep MM:SS times across the whole video
+            short_transcript = self.summarizer.condense(transcript, segments, video_title)
             
             prompt = f"""
             Generate timestamps for this video.
@@ -188,160 +302,297 @@ class GPTService:
             logger.error(f"Error generating timestamps: {str(e)}")
             raise Exception(f"Failed to generate timestamps: {str(e)}")
 
-    def generate_scene_descriptions(self, scene_timestamps, transcript, video_title=""):
-        """Generate descriptions for specific scene timestamps without modifying the timestamps"""
+    def generate_scene_descriptions(self, scene_timestamps, transcript, video_title="", max_workers=None,
+                                    batched=True, segments=None):
+        """Generate descriptions for specific scene timestamps without modifying the timestamps
+        
+        Scenes are described concurrently (max_workers, default self.max_concurrency) under the
+        shared rate limiter; results keep the order of scene_timestamps. With batched, several
+        scenes share one JSON-mode request (see _plan_scene_batches). Given Whisper segments,
+        each scene gets exactly the text spoken during it.
+        """
         try:
             logger.info("Starting scene descriptions generation...")
             
             if not scene_timestamps:
                 return []
             
-            scene_descriptions = []
-            
-            for i, scene_ts in enumerate(scene_timestamps):
-                start_time = scene_ts.get("start_time", 0)
-                end_time = scene_ts.get("end_time", 0)
-                duration = end_time - start_time
-                
-                # Extract transcript segment for this scene with more context
-                scene_transcript = self._extract_transcript_segment(transcript, start_time, end_time)
-                
-                if scene_transcript.strip():
-                    # Get more context by including surrounding content
-                    context_before = self._extract_transcript_segment(transcript, max(0, start_time - 30), start_time)
-                    context_after = self._extract_transcript_segment(transcript, end_time, min(len(transcript), end_time + 30))
-                    
-                    prompt = f"""
-                    Create a specific, accurate description for this video scene.
-                    
-                    Video Title: {video_title}
-                    Scene {i+1} of {len(scene_timestamps)}
-                    Duration: {duration:.1f} seconds ({start_time:.1f}s - {end_time:.1f}s)
-                    
-                    Previous Context: {context_before[-200:] if context_before else "Start of video"}
-                    
-                    Scene Content:
-                    {scene_transcript}
-                    
-                    Next Context: {context_after[:200] if context_after else "End of video"}
-                    
-                    Requirements:
-                    - Be specific to the actual content in this scene
-                    - Focus on the main topic, concept, or action
-                    - Use 3-8 words maximum
-                    - Avoid generic terms like "Scene", "Part", "Section"
-                    - Make it useful for navigation
-                    - Be unique and different from other scenes
-                    
-                    Examples of good descriptions:
-                    - "React useState hook"
-                    - "Database connection setup"
-                    - "Error handling demo"
-                    - "Final code review"
-                    - "API endpoint creation"
-                    - "User authentication"
-                    
-                    Description:"""
-                    
-                    messages = [
-                        {"role": "system", "content": "You are an expert video content analyzer. Create precise, unique descriptions for video segments."},
-                        {"role": "user", "content": prompt}
-                    ]
-                    
-                    description = self._make_api_call(messages, max_tokens=100, temperature=0.4)
-                    
-                    # Clean up the description
-                    if description:
-                        description = description.strip()
-                        # Remove quotes if present
-                        if description.startswith('"') and description.endswith('"'):
-                            description = description[1:-1]
-                        # Remove numbering if present
-                        if description.startswith(f"{i+1}. "):
-                            description = description[len(f"{i+1}. "):]
-                        # Ensure it's not too long
-                        if len(description) > 80:
-                            description = description[:77] + "..."
-                        
-                        scene_descriptions.append({
-                            "scene_index": i,
-                            "description": description,
-                            "start_time": start_time,
-                            "end_time": end_time,
-                            "duration": duration
-                        })
-                    else:
-                        # Fallback description
-                        scene_descriptions.append({
-                            "scene_index": i,
-                            "description": f"Scene {i+1} ({duration:.1f}s)",
-                            "start_time": start_time,
-                            "end_time": end_time,
-                            "duration": duration
-                        })
-                else:
-                    # No transcript available for this scene
-                    scene_descriptions.append({
-                        "scene_index": i,
-                        "description": f"Scene {i+1} ({duration:.1f}s)",
-                        "start_time": start_time,
-                        "end_time": end_time,
-                        "duration": duration
-                    })
-            
-            logger.info(f"Generated {len(scene_descriptions)} scene descriptions")
+            total = len(scene_timestamps)
+            index = TranscriptIndex(segments) if segments else None
+            if batched and total > 1:
+                batches = self._plan_scene_batches(scene_timestamps, transcript, index)
+                describe = lambda batch: self._describe_scene_batch(batch, total, transcript, video_title, index)
+            else:
+                batches = list(enumerate(scene_timestamps))
+                describe = lambda item: [self._describe_scene(item[0], item[1], total, transcript, video_title, index)]
+            
+            workers = max(1, min(max_workers or self.max_concurrency, len(batches)))
+            if workers == 1:
+                results = [describe(batch) for batch in batches]
+            else:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scene-desc") as executor:
+                    results = list(executor.map(bind_context(describe), batches))
+            
+            scene_descriptions = sorted(
+                (entry for entries in results for entry in entries), key=lambda entry: entry["scene_index"]
+            )
+            logger.info(f"Generated {len(scene_descriptions)} scene descriptions "
+                        f"in {len(batches)} requests ({workers} concurrent)")
             return scene_descriptions
             
         except Exception as e:
             logger.error(f"Error generating scene descriptions: {str(e)}")
             raise Exception(f"Failed to generate scene descriptions: {str(e)}")
+
+    def _describe_scene(self, i, scene_ts, total, transcript, video_title, index=None):
+        """One scene's description entry; falls back to "Scene N (duration)" without transcript or reply"""
+        start_time = scene_ts.get("start_time", 0)
+        end_time = scene_ts.get("end_time", 0)
+        duration = end_time - start_time
+        
+        # Extract transcript segment for this scene with more context
+        scene_transcript = self._extract_transcript_segment(transcript, start_time, end_time, index)
+        
+        description = None
+        if scene_transcript.strip():
+            # Get more context by including surrounding content
+            context_before = self._extract_transcript_segment(transcript, max(0, start_time - 30), start_time, index)
+            context_after = self._extract_transcript_segment(transcript, end_time, end_time + 30, index)
+            
+            prompt = f"""
+            Create a specific, accurate description for this video scene.
+            
+            Video Title: {video_title}
+            Scene {i+1} of {total}
+            Duration: {duration:.1f} seconds ({start_time:.1f}s - {end_time:.1f}s)
+            
+            Previous Context: {context_before[-200:] if context_before else "Start of video"}
+            
+            Scene Content:
+            {scene_transcript}
+            
+            Next Context: {context_after[:200] if context_after else "End of video"}
+            
+            Requirements:
+            - Be specific to the actual content in this scene
+            - Focus on the main topic, concept, or action
+            - Use 3-8 words maximum
+            - Avoid generic terms like "Scene", "Part", "Section"
+            - Make it useful for navigation
+            - Be unique and different from other scenes
+            
+            Examples of good descriptions:
+            - "React useState hook"
+            - "Database connection setup"
+            - "Error handling demo"
+            - "Final code review"
+            - "API endpoint creation"
+            - "User authentication"
+            
+            Description:"""
+            
+            messages = [
+                {"role": "system", "content": "You are an expert video content analyzer. Create precise, unique descriptions for video segments."},
+                {"role": "user", "content": prompt}
+            ]
+            
+            try:
+                description = self._make_api_call(messages, max_tokens=100, temperature=0.4)
+            except CircuitOpenError:
+                description = None
+        
+        return self._scene_entry(i, scene_ts, description)
+    
+    def _scene_entry(self, i, scene_ts, description):
+        start_time = scene_ts.get("start_time", 0)
+        end_time = scene_ts.get("end_time", 0)
+        duration = end_time - start_time
+        
+        # Clean up the description
+        if description:
+            description = description.strip()
+            # Remove quotes if present
+            if description.startswith('"') and description.endswith('"'):
+                description = description[1:-1]
+            # Remove numbering if present
+            if description.startswith(f"{i+1}. "):
+                description = description[len(f"{i+1}. "):]
+            # Ensure it's not too long
+            if len(description) > 80:
+                description = description[:77] + "..."
+        else:
+            # Fallback description
+            description = f"Scene {i+1} ({duration:.1f}s)"
+        
+        return {
+            "scene_index": i,
+            "description": description,
+            "start_time": start_time,
+            "end_time": end_time,
+            "duration": duration
+        }
     
-    def _extract_transcript_segment(self, transcript, start_time, end_time):
-        """Extract transcript segment for a specific time range with better context"""
+    def _plan_scene_batches(self, scene_timestamps, transcript, index=None):
+        """Pack (index, scene, transcript slice) items into batches that fit the prompt token budget
+        
+        Scenes with dense speech take more of the budget, so N adapts to the content: a batch
+        closes when the next scene would exceed SCENE_BATCH_TOKEN_BUDGET or SCENE_BATCH_MAX_SCENES.
+        """
+        batches = []
+        current, current_tokens = [], 0
+        for i, scene_ts in enumerate(scene_timestamps):
+            start_time, end_time = scene_ts.get("start_time", 0), scene_ts.get("end_time", 0)
+            # The character budget is for what was said; the time header is added on top
+            spoken = self._transcript_text(transcript, start_time, end_time, index)[:SCENE_BATCH_SCENE_CHARS]
+            scene_text = self._with_time_context(spoken, start_time, end_time) if spoken.strip() else ""
+            # Each scene also costs about 20 completion tokens
+            tokens = len(scene_text) // 4 + 20
+            if current and (current_tokens + tokens > SCENE_BATCH_TOKEN_BUDGET or len(current) >= SCENE_BATCH_MAX_SCENES):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append((i, scene_ts, scene_text))
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _describe_scene_batch(self, batch, total, transcript, video_title, index=None):
+        """Describe a batch of scenes in one JSON-mode request; scenes missing from the reply are retried alone"""
+        # Scenes without speech get the fallback description without asking the model
+        silent = [(i, scene_ts) for i, scene_ts, scene_text in batch if not scene_text.strip()]
+        batch = [item for item in batch if item[2].strip()]
+        entries = [self._scene_entry(i, scene_ts, None) for i, scene_ts in silent]
+        if not batch:
+            return entries
+        
+        scene_blocks = []
+        for i, scene_ts, scene_text in batch:
+            scene_blocks.append(f"### scene_index {i} (scene {i+1} of {total})\n{scene_text.strip()}")
+        
+        prompt = f"""
+        Create a specific, accurate description for each of these video scenes.
+        
+        Video Title: {video_title}
+        
+        {chr(10).join(scene_blocks)}
+        
+        Requirements:
+        - Be specific to the actual content in each scene
+        - Focus on the main topic, concept, or action
+        - Use 3-8 words maximum per description
+        - Avoid generic terms like "Scene", "Part", "Section"
+        - Make each description unique and useful for navigation
+        
+        Respond with JSON only, in this exact shape:
+        {{"scenes": [{{"scene_index": <int>, "description": "<text>"}}]}}
+        with one entry for every scene_index above."""
+        
+        messages = [
+            {"role": "system", "content": "You are an expert video content analyzer. Create precise, unique descriptions for video segments. Reply with valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+        
+        descriptions = {}
+        try:
+            content = self._make_api_call(
+                messages, max_tokens=40 * len(batch) + 50, temperature=0.4,
+                response_format={"type": "json_object"}
+            )
+            descriptions = self._parse_scene_batch(content, {i for i, _, _ in batch})
+        except Exception as e:
+            logger.warning(f"Batched scene description request failed: {str(e)}")
+        
+        for i, scene_ts, _ in batch:
+            if i in descriptions:
+                entries.append(self._scene_entry(i, scene_ts, descriptions[i]))
+            else:
+                logger.warning(f"Scene {i+1} missing from batched reply, describing it separately")
+                entries.append(self._describe_scene(i, scene_ts, total, transcript, video_title, index))
+        return entries
+    
+    def _parse_scene_batch(self, content, expected_indexes):
+        """Map scene_index -> description from a batched reply, ignoring malformed or unexpected entries"""
+        if not content:
+            return {}
+        # Tolerate a fenced code block around the JSON
+        match = re.search(r'[\[{].*[\]}]', content, re.DOTALL)
         try:
-            # Calculate timing information
-            duration = end_time - start_time
-            start_minutes = int(start_time // 60)
-            start_seconds = int(start_time % 60)
-            end_minutes = int(end_time // 60)
-            end_seconds = int(end_time % 60)
-            
-            # Estimate character position based on time (rough approximation)
-            # Assuming average speaking rate of 150 words per minute
-            # and average word length of 5 characters
-            chars_per_second = (150 * 5) / 60  # ~12.5 characters per second
-            
-            start_char = int(start_time * chars_per_second)
-            end_char = int(end_time * chars_per_second)
-            
-            # Ensure we don't go out of bounds
-            start_char = max(0, min(start_char, len(transcript)))
-            end_char = max(start_char, min(end_char, len(transcript)))
-            
-            # Extract the segment
-            segment = transcript[start_char:end_char]
-            
-            # If segment is too short, expand it
-            if len(segment) < 50:
-                # Expand by 100 characters on each side
-                expanded_start = max(0, start_char - 100)
-                expanded_end = min(len(transcript), end_char + 100)
-                segment = transcript[expanded_start:expanded_end]
-            
-            # Add timing context
-            context = f"""
+            data = json.loads(match.group(0) if match else content)
+        except ValueError:
+            logger.warning("Batched scene reply was not valid JSON")
+            return {}
+        
+        items = data.get("scenes", []) if isinstance(data, dict) else data
+        descriptions = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            index = item.get("scene_index")
+            description = item.get("description")
+            if isinstance(index, int) and index in expected_indexes and isinstance(description, str) and description.strip():
+                descriptions[index] = description
+        return descriptions
+    
+    def _extract_transcript_segment(self, transcript, start_time, end_time, index=None):
+        """Extract transcript segment for a specific time range with better context
+        
+        With a TranscriptIndex the text is exactly what was said in the range ("" if nothing);
+        without one, character offsets are estimated from time.
+        """
+        try:
+            segment = self._transcript_text(transcript, start_time, end_time, index)
+            if index is not None and not segment:
+                return ""
+            return self._with_time_context(segment, start_time, end_time)
+            
+        except Exception as e:
+            logger.error(f"Error extracting transcript segment: {str(e)}")
+            return transcript
+    
+    def _transcript_text(self, transcript, start_time, end_time, index=None):
+        """The bare transcript text of a time range, without the time context header"""
+        if index is not None:
+            return index.text(start_time, end_time)
+        # Estimate character position based on time (rough approximation)
+        # Assuming average speaking rate of 150 words per minute
+        # and average word length of 5 characters
+        chars_per_second = (150 * 5) / 60  # ~12.5 characters per second
+        
+        start_char = int(start_time * chars_per_second)
+        end_char = int(end_time * chars_per_second)
+        
+        # Ensure we don't go out of bounds
+        start_char = max(0, min(start_char, len(transcript)))
+        end_char = max(start_char, min(end_char, len(transcript)))
+        
+        # Extract the segment
+        segment = transcript[start_char:end_char]
+        
+        # If segment is too short, expand it
+        if len(segment) < 50:
+            # Expand by 100 characters on each side
+            expanded_start = max(0, start_char - 100)
+            expanded_end = min(len(transcript), end_char + 100)
+            segment = transcript[expanded_start:expanded_end]
+        return segment
+    
+    def _with_time_context(self, segment, start_time, end_time):
+        """Prefix a transcript slice with its time range and duration"""
+        duration = end_time - start_time
+        start_minutes = int(start_time // 60)
+        start_seconds = int(start_time % 60)
+        end_minutes = int(end_time // 60)
+        end_seconds = int(end_time % 60)
+        
+        context = f"""
             Time Range: {start_minutes:02d}:{start_seconds:02d} - {end_minutes:02d}:{end_seconds:02d}
             Duration: {duration:.1f} seconds
             
             Content for this time period:
             {segment}
             """
-            
-            return context.strip()
-            
-        except Exception as e:
-            logger.error(f"Error extracting transcript segment: {str(e)}")
-            return transcript
+        
+        return context.strip()
 
     def filter_main_scenes(self, scene_timestamps, transcript, video_title=""):
         """Filter scenes to only include main/important scenes using GPT"""
@@ -455,4 +706,128 @@ class GPTService:
         except Exception as e:
             logger.error(f"Error filtering main scenes: {str(e)}")
             # Return all scenes as fallback
-            return scene_timestamps 
\ No newline at end of file
+            return scene_timestamps 
+
+    def generate_combined(self, transcript, video_title="", scene_timestamps=None, segments=None,
+                          features=("summary", "description", "timestamps")):
+        """Summary, description, main scenes and scene labels from one JSON-mode request
+        
+        The transcript is sent once instead of once per feature. Any part of the reply that
+        fails validation is produced by the individual method instead, and listed in
+        "fallbacks". Returns a dict with summary, description, main_scenes, scene_descriptions.
+        """
+        logger.info("Starting combined generation...")
+        scene_timestamps = (scene_timestamps or []) if 'timestamps' in features else []
+        index = TranscriptIndex(segments) if segments else None
+        content = self.summarizer.condense(transcript, segments, video_title)
+        
+        # Split the scene budget evenly; every scene keeps at least a short slice
+        scene_chars = max(80, COMBINED_SCENE_TOKENS * 4 // max(1, len(scene_timestamps)))
+        scene_blocks = []
+        for i, scene_ts in enumerate(scene_timestamps):
+            start_time = scene_ts.get("start_time", 0)
+            end_time = scene_ts.get("end_time", 0)
+            # The block label already carries the time range, so only the spoken text is sliced
+            scene_text = self._transcript_text(transcript, start_time, end_time, index)
+            scene_blocks.append(
+                f"### scene_index {i} ({start_time:.1f}s - {end_time:.1f}s)\n{scene_text[:scene_chars] or '(no speech)'}"
+            )
+        
+        wants_selection = len(scene_timestamps) > 8
+        fields = []
+        if 'summary' in features:
+            fields.append('"summary": "<1-2 paragraph summary, then key points and main topics>"')
+        if 'description' in features:
+            fields.append('"description": "<engaging description under 120 characters>"')
+        if wants_selection:
+            fields.append('"main_scenes": [<scene_index of each main/important scene, keep 70-80% of them>]')
+        if scene_timestamps:
+            fields.append('"scenes": [{"scene_index": <int>, "description": "<3-8 word label>"}]')
+        
+        prompt = f"""
+        Analyze this educational video and produce everything below in one JSON object.
+        
+        Title: {video_title}
+        Content: {content}
+        
+        {"Detected scenes:" + chr(10) + chr(10).join(scene_blocks) if scene_blocks else ""}
+        
+        Requirements:
+        - Summary: concise, covering the whole video
+        - Description: engaging, clear, focused on the main topic
+        - Scene labels: specific to each scene's content, 3-8 words, unique, no generic terms like "Scene" or "Part"
+        
+        Respond with JSON only, in this exact shape:
+        {{{", ".join(fields)}}}"""
+        
+        messages = [
+            {"role": "system", "content": "You are an expert educational content analyzer. Reply with valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+        max_tokens = 150 + (600 if 'summary' in features else 0) + (150 if 'description' in features else 0)
+        max_tokens += 30 * len(scene_timestamps)
+        
+        data = {}
+        try:
+            reply = self._make_api_call(messages, max_tokens=max_tokens, temperature=0.3,
+                                        response_format={"type": "json_object"})
+            match = re.search(r'\{.*\}', reply or "", re.DOTALL)
+            data = json.loads(match.group(0)) if match else {}
+        except Exception as e:
+            logger.warning(f"Combined generation request failed: {str(e)}")
+        if not isinstance(data, dict):
+            data = {}
+        
+        result = {"summary": None, "description": None, "main_scenes": [], "scene_descriptions": [], "fallbacks": []}
+        
+        if 'summary' in features:
+            summary = data.get("summary")
+            if isinstance(summary, str) and summary.strip():
+                result["summary"] = summary.strip()
+            else:
+                result["fallbacks"].append("summary")
+                result["summary"] = self.generate_summary(transcript, video_title, segments=segments)
+        
+        if 'description' in features:
+            description = data.get("description")
+            if isinstance(description, str) and description.strip():
+                description = description.strip()
+                result["description"] = description[:117] + "..." if len(description) > 120 else description
+            else:
+                result["fallbacks"].append("description")
+                result["description"] = self.generate_description(transcript, video_title, segments=segments)
+        
+        if scene_timestamps:
+            kept = list(range(len(scene_timestamps)))
+            if wants_selection:
+                selection = data.get("main_scenes")
+                valid = sorted({n for n in selection if isinstance(n, int) and 0 <= n < len(scene_timestamps)}) \
+                    if isinstance(selection, list) else []
+                # Same bar as filter_main_scenes: a selection dropping over 40% is not trusted
+                if len(valid) >= len(scene_timestamps) * 0.6:
+                    kept = valid
+                else:
+                    result["fallbacks"].append("main_scenes")
+                    main_scenes = self.filter_main_scenes(scene_timestamps, transcript, video_title)
+                    kept = [i for i, scene_ts in enumerate(scene_timestamps) if scene_ts in main_scenes]
+            result["main_scenes"] = [scene_timestamps[i] for i in kept]
+            
+            labels = self._parse_scene_batch(json.dumps({"scenes": data.get("scenes", [])}), set(kept))
+            labelled = set(labels)
+            missing = [j for j, i in enumerate(kept) if i not in labelled]
+            entries = {j: self._scene_entry(j, scene_timestamps[i], labels[i]) for j, i in enumerate(kept) if i in labelled}
+            if missing:
+                result["fallbacks"].append("scene_descriptions")
+                logger.warning(f"{len(missing)} scene labels missing from combined reply, generating them separately")
+                # Each scene keeps its own position and the full count in its prompt
+                total = len(kept)
+                index = TranscriptIndex(segments) if segments else None
+                describe = lambda j: self._describe_scene(j, result["main_scenes"][j], total, transcript, video_title, index)
+                workers = max(1, min(self.max_concurrency, len(missing)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scene-desc") as executor:
+                    for j, entry in zip(missing, executor.map(bind_context(describe), missing)):
+                        entries[j] = entry
+            result["scene_descriptions"] = [entries[j] for j in sorted(entries)]
+        
+        logger.info(f"Combined generation completed (fallbacks: {result['fallbacks'] or 'none'})")
+        return result
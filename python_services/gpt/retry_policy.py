@@ -0,0 +1,187 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = int(os.getenv('OPENAI_MAX_ATTEMPTS', '4'))
+BASE_DELAY_SECONDS = float(os.getenv('OPENAI_RETRY_BASE_SECONDS', '0.5'))
+MAX_DELAY_SECONDS = float(os.getenv('OPENAI_RETRY_MAX_SECONDS', '20'))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('OPENAI_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('OPENAI_BREAKER_RESET_SECONDS', '30'))
+
+# Error classes
+RATE_LIMITED = "rate_limited"   # 429: wait (Retry-After if given) and retry
+TRANSIENT = "transient"         # timeouts, connection errors, 5xx: back off and retry
+FATAL = "fatal"                 # bad request, auth, quota: retrying cannot help
+
+_TRANSIENT_NAMES = {
+    'Timeout', 'APITimeoutError', 'APIConnectionError', 'ServiceUnavailableError', 'TryAgain',
+    'InternalServerError', 'ConnectionError', 'ReadTimeout', 'ConnectTimeout'
+}
+# Libraries whose exceptions mean the API or the network failed, not our code
+_TRANSPORT_MODULES = {'openai', 'requests', 'httpx', 'httpcore', 'urllib3'}
+_FATAL_NAMES = {
+    'InvalidRequestError', 'BadRequestError', 'AuthenticationError', 'PermissionError',
+    'PermissionDeniedError', 'NotFoundError', 'UnprocessableEntityError', 'InvalidAPIType'
+}
+
+
+def _status_code(error):
+    status = getattr(error, 'http_status', None) or getattr(error, 'status_code', None)
+    if status is None and getattr(error, 'response', None) is not None:
+        status = getattr(error.response, 'status_code', None)
+    return status
+
+
+def _headers(error):
+    headers = getattr(error, 'headers', None)
+    if not headers and getattr(error, 'response', None) is not None:
+        headers = getattr(error.response, 'headers', None)
+    return headers or {}
+
+
+def _is_transport_error(error):
+    module = type(error).__module__.split('.')[0]
+    return module in _TRANSPORT_MODULES or isinstance(error, (TimeoutError, ConnectionError))
+
+
+def classify_error(error):
+    """Map an exception from either openai client generation to RATE_LIMITED, TRANSIENT or FATAL
+
+    Only API and network errors can be TRANSIENT; anything else (e.g. a bug while
+    reading the reply) is FATAL, so it is neither retried nor counted by the breaker.
+    """
+    name = type(error).__name__
+    status = _status_code(error)
+    if getattr(error, 'code', None) == 'insufficient_quota':
+        return FATAL
+    if name == 'RateLimitError' or status == 429:
+        return RATE_LIMITED
+    if name in _FATAL_NAMES or (status is not None and 400 <= status < 500 and status not in (408, 409)):
+        return FATAL
+    if (status is not None and status >= 500) or status in (408, 409):
+        return TRANSIENT
+    if name in _TRANSIENT_NAMES or _is_transport_error(error):
+        # Includes an openai APIError without a status: the upstream or the network
+        return TRANSIENT
+    return FATAL
+
+
+def is_fatal_api_error(error):
+    """Whether error is an API or network error that retrying cannot help (bad request, auth, quota)"""
+    name = type(error).__name__
+    api_error = name in _FATAL_NAMES or name == 'RateLimitError' or _is_transport_error(error)
+    return api_error and classify_error(error) == FATAL
+
+
+def retry_after_seconds(error):
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), or None"""
+    headers = _headers(error)
+    try:
+        value = headers.get('retry-after-ms') or headers.get('Retry-After-Ms')
+        if value is not None:
+            return float(value) / 1000.0
+        value = headers.get('retry-after') or headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class CircuitOpenError(Exception):
+    """The upstream is considered degraded; the call was not attempted"""
+
+
+class RetryPolicy:
+    """Full-jitter exponential backoff, stretched to any Retry-After the server sent"""
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY_SECONDS, max_delay=MAX_DELAY_SECONDS):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error_class, attempt):
+        return error_class != FATAL and attempt + 1 < self.max_attempts
+
+    def delay(self, attempt, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        server_delay = retry_after_seconds(error)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.max_delay * 3))
+        return delay
+
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive upstream failures; open -> half_open
+    after reset_timeout, when one trial call decides whether to close again"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError("OpenAI API circuit breaker is open; upstream is degraded")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("OpenAI circuit breaker closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"OpenAI circuit breaker opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self._trial_running = False
+
+    def release_trial(self):
+        """A half-open trial ended without an upstream verdict (e.g. a client-side error)"""
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.time() - self.opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "rejected_calls": self.rejected,
+                "retry_in_seconds": retry_in
+            }
@@ -0,0 +1,291 @@
+"""Local OpenAI-compatible chat completions server for offline load tests and benchmarks
+
+Run from python_services/ and point the service at it:
+
+    python -m gpt.stub_server --port 8001 --latency lognormal:0.8:0.5 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python api.py
+
+Modes:
+    canned  deterministic replies derived from a hash of the request (default). JSON-mode
+            requests get JSON in the shape the scene batch / combined prompts ask for.
+    record  forward every request to --upstream with OPENAI_API_KEY and store the replies
+    replay  answer from the recording; requests that were never recorded fall back to canned
+
+Latency is drawn per request from --latency (fixed:S, uniform:MIN:MAX, normal:MEAN:STD or
+lognormal:MEDIAN:SIGMA, all in seconds) plus --per-token-ms for every completion token.
+Replies are stored in the GPT response cache keyed by base URL as well, but repeated benchmark
+runs will still hit it; set GPT_CACHE_PATH to a throwaway file for cold-cache numbers.
+"""
+import os
+import re
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+import requests
+from flask import Flask, Response, request, jsonify
+from gpt.response_cache import fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECORDING_PATH = os.path.join(os.path.dirname(__file__), '..', 'cache', 'gpt_recording.jsonl')
+
+_WORDS = (
+    "overview concept example method data model analysis lecture topic definition process system "
+    "structure function algorithm theory practice design result review introduction summary detail "
+    "network memory object class pattern query security testing performance architecture"
+).split()
+
+
+def parse_latency(spec):
+    """Turn a latency spec such as 'uniform:0.2:1.5' into a sampler taking a random.Random"""
+    kind, _, params = (spec or "fixed:0").partition(':')
+    values = [float(value) for value in params.split(':') if value] if params else []
+    if kind == 'fixed':
+        delay = values[0] if values else 0.0
+        return lambda rng: delay
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal' and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal' and len(values) == 2:
+        # Parameterised by the median so the spec reads in seconds
+        mu = math.log(values[0]) if values[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+
+def count_tokens(text):
+    return len(text or "") // 4 + 1
+
+
+class UpstreamError(Exception):
+    """Non-2xx reply from the upstream in record mode, relayed to the client as is"""
+
+    def __init__(self, response):
+        super().__init__(f"Upstream returned {response.status_code}")
+        self.response = response
+
+
+class StubBackend:
+    """Decides the latency, the failure (if any) and the content of each stub reply"""
+
+    def __init__(self, mode='canned', latency='fixed:0', per_token_ms=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1.0, seed=0, recording_path=DEFAULT_RECORDING_PATH,
+                 upstream='https://api.openai.com/v1', upstream_timeout=60):
+        if mode not in ('canned', 'record', 'replay'):
+            raise ValueError(f"Unknown stub mode: {mode}")
+        self.mode = mode
+        self.sample_latency = parse_latency(latency)
+        self.per_token_seconds = per_token_ms / 1000.0
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.recording_path = os.path.abspath(recording_path)
+        self.upstream = upstream.rstrip('/')
+        self.upstream_timeout = upstream_timeout
+        self.recording = {}
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0, "replayed": 0, "recorded": 0, "canned": 0}
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self._load_recording()
+
+    def _load_recording(self):
+        if not os.path.exists(self.recording_path):
+            logger.warning(f"No recording at {self.recording_path}; every request will get a canned reply")
+            return
+        with open(self.recording_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recording[entry["key"]] = entry["response"]
+        logger.info(f"Loaded {len(self.recording)} recorded responses from {self.recording_path}")
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def draw(self):
+        """One locked draw of the failure outcome and base latency, so a seed reproduces a run"""
+        with self._lock:
+            self.counts["requests"] += 1
+            roll = self.rng.random()
+            latency = self.sample_latency(self.rng)
+        if roll < self.rate_limit_rate:
+            return 'rate_limited', latency
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 'error', latency
+        return None, latency
+
+    def request_key(self, body):
+        return fingerprint(body.get("model"), body.get("messages"), body.get("max_tokens"),
+                           body.get("temperature"), response_format=body.get("response_format"))
+
+    def complete(self, body):
+        """Chat completion response body for a request body"""
+        key = self.request_key(body)
+        if self.mode == 'record':
+            response = self._forward(body)
+            self._record(key, response)
+            return response
+        if self.mode == 'replay' and key in self.recording:
+            self._count("replayed")
+            return self.recording[key]
+        self._count("canned")
+        return self._canned(body, key)
+
+    def _forward(self, body):
+        response = requests.post(
+            f"{self.upstream}/chat/completions",
+            json=body,
+            headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"},
+            timeout=self.upstream_timeout
+        )
+        if response.status_code >= 400:
+            raise UpstreamError(response)
+        return response.json()
+
+    def _record(self, key, response):
+        with self._lock:
+            self.counts["recorded"] += 1
+            os.makedirs(os.path.dirname(self.recording_path), exist_ok=True)
+            with open(self.recording_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, "response": response}) + "\n")
+
+    def _canned(self, body, key):
+        messages = body.get("messages") or []
+        prompt = "\n".join(message.get("content") or "" for message in messages)
+        max_tokens = int(body.get("max_tokens") or 256)
+        # Seeded by the request, not the shared rng, so identical requests get identical replies
+        rng = random.Random(key)
+
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(self._canned_json(prompt, rng))
+        else:
+            content = self._phrase(rng, max(4, min(max_tokens * 3 // 4, 120)))
+
+        return {
+            "id": f"chatcmpl-stub-{key[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or "gpt-3.5-turbo",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": count_tokens(prompt),
+                "completion_tokens": count_tokens(content),
+                "total_tokens": count_tokens(prompt) + count_tokens(content)
+            }
+        }
+
+    def _canned_json(self, prompt, rng):
+        """JSON with the fields the prompt's 'exact shape' asks for, covering every scene_index in it"""
+        shape = prompt[prompt.rfind("exact shape"):] if "exact shape" in prompt else prompt
+        scene_indexes = sorted({int(n) for n in re.findall(r'scene_index (\d+)', prompt)})
+        data = {}
+        if '"summary"' in shape:
+            data["summary"] = self._phrase(rng, 60)
+        if '"description"' in shape and '"scenes"' not in shape.split('"description"')[0]:
+            data["description"] = self._phrase(rng, 12)
+        if '"main_scenes"' in shape:
+            keep = max(1, math.ceil(len(scene_indexes) * 0.75))
+            data["main_scenes"] = sorted(rng.sample(scene_indexes, keep)) if scene_indexes else []
+        if '"scenes"' in shape:
+            data["scenes"] = [
+                {"scene_index": i, "description": self._phrase(rng, rng.randint(3, 6)).rstrip('.').title()}
+                for i in scene_indexes
+            ]
+        return data
+
+    def _phrase(self, rng, words):
+        return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, mode=self.mode)
+
+
+def create_app(backend):
+    app = Flask(__name__)
+
+    def error(status, message, error_type, code=None, headers=None):
+        body = {"error": {"message": message, "type": error_type, "param": None, "code": code}}
+        return Response(json.dumps(body), status=status, mimetype='application/json', headers=headers or {})
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get("messages"), list):
+            return error(400, "messages is required", "invalid_request_error")
+
+        failure, latency = backend.draw()
+        if failure == 'rate_limited':
+            backend._count("rate_limited")
+            return error(429, "Rate limit reached (stub)", "requests", "rate_limit_exceeded",
+                         headers={"Retry-After": str(backend.retry_after)})
+        time.sleep(latency)
+        if failure == 'error':
+            backend._count("errors")
+            return error(500, "The server had an error while processing your request (stub)", "server_error")
+
+        try:
+            response = backend.complete(body)
+        except UpstreamError as e:
+            # Only successful replies are recorded; errors go back unchanged so retries behave as upstream
+            retry_after = e.response.headers.get('Retry-After')
+            return Response(e.response.content, status=e.response.status_code, mimetype='application/json',
+                            headers={"Retry-After": retry_after} if retry_after else {})
+        except requests.RequestException as e:
+            logger.error(f"Upstream request failed: {str(e)}")
+            return error(502, f"Upstream request failed: {str(e)}", "server_error")
+
+        completion_tokens = (response.get("usage") or {}).get("completion_tokens", 0)
+        if backend.per_token_seconds:
+            time.sleep(completion_tokens * backend.per_token_seconds)
+        return jsonify(response)
+
+    @app.route('/v1/models', methods=['GET'])
+    def models():
+        return jsonify({"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model", "owned_by": "stub"}]})
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        return jsonify({"status": "healthy", "stub": backend.stats()})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.getenv('OPENAI_STUB_PORT', '8001')))
+    parser.add_argument('--mode', choices=['canned', 'record', 'replay'], default='canned')
+    parser.add_argument('--latency', default='fixed:0', help="fixed:S, uniform:MIN:MAX, normal:MEAN:STD or lognormal:MEDIAN:SIGMA")
+    parser.add_argument('--per-token-ms', type=float, default=0.0, help="extra latency per completion token")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="fraction of requests answered with a 429")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--recording', default=DEFAULT_RECORDING_PATH, help="JSONL file for record/replay")
+    parser.add_argument('--upstream', default='https://api.openai.com/v1', help="API forwarded to in record mode")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    backend = StubBackend(
+        mode=args.mode, latency=args.latency, per_token_ms=args.per_token_ms, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed,
+        recording_path=args.recording, upstream=args.upstream
+    )
+    logger.info(f"OpenAI stub ({args.mode}) on http://{args.host}:{args.port}/v1")
+    create_app(backend).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
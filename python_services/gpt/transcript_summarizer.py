@@ -0,0 +1,146 @@
+import os
+import re
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from common.single_flight import SingleFlight
+from gpt.usage import bind_context
+
+logger = logging.getLogger(__name__)
+
+# Transcript tokens per map chunk, and the size the reduced notes must fit in
+CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '2500'))
+NOTES_TOKENS = int(os.getenv('SUMMARY_NOTES_TOKENS', '1500'))
+# Partial notes combined by one reduce call
+REDUCE_FANIN = int(os.getenv('SUMMARY_REDUCE_FANIN', '6'))
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_time(seconds):
+    return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}"
+
+
+def text_segments(transcript):
+    """Sentence-sized pseudo-segments (without timing) for transcripts that come as plain text"""
+    sentences = re.split(r'(?<=[.!?])\s+', transcript.strip())
+    return [{"text": sentence, "start": None, "end": None} for sentence in sentences if sentence]
+
+
+class TranscriptSummarizer:
+    """Condense a full transcript into bounded notes with map-reduce over GPT
+
+    The transcript is split into token-bounded chunks on Whisper segment boundaries,
+    each chunk is summarized concurrently (map), and the partial notes are merged in
+    groups of REDUCE_FANIN until they fit NOTES_TOKENS (reduce). Every call goes through
+    the GPT response cache, so a re-run only pays for chunks whose text changed.
+    """
+
+    def __init__(self, gpt_service, chunk_tokens=CHUNK_TOKENS, notes_tokens=NOTES_TOKENS, reduce_fanin=REDUCE_FANIN):
+        self.gpt = gpt_service
+        self.chunk_tokens = chunk_tokens
+        self.notes_tokens = notes_tokens
+        self.reduce_fanin = max(2, reduce_fanin)
+        # Summary, description and timestamps for one video often ask for the same notes at once
+        self._flights = SingleFlight("transcript-notes")
+
+    def chunk(self, segments):
+        """Group consecutive segments into chunks of at most chunk_tokens (a longer single segment stands alone)
+
+        Past half the budget a chunk also ends after any segment whose text hash hits a
+        1-in-4 boundary, so an edited segment only shifts boundaries until the next such
+        segment instead of for the rest of the transcript.
+        """
+        chunks = []
+        current, current_tokens = [], 0
+        for segment in segments:
+            text = segment.get("text", "").strip()
+            if not text:
+                continue
+            tokens = count_tokens(text)
+            if current and current_tokens + tokens > self.chunk_tokens:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(segment)
+            current_tokens += tokens
+            if current_tokens >= self.chunk_tokens // 2 and hashlib.md5(text.encode('utf-8')).digest()[0] % 4 == 0:
+                chunks.append(current)
+                current, current_tokens = [], 0
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def condense(self, transcript, segments=None, video_title=""):
+        """The transcript itself when it fits notes_tokens, otherwise map-reduced notes of all of it"""
+        if count_tokens(transcript) <= self.notes_tokens:
+            return transcript
+        return self.notes(transcript, segments, video_title)
+
+    def notes(self, transcript, segments=None, video_title=""):
+        """Notes covering the whole transcript, at most about notes_tokens long"""
+        segments = segments or text_segments(transcript)
+        key = hashlib.sha256(f"{video_title}\0{transcript}".encode('utf-8')).hexdigest()
+        return self._flights.do(key, self._build_notes, segments, video_title)
+
+    def _build_notes(self, segments, video_title):
+        chunks = self.chunk(segments)
+        workers = max(1, min(self.gpt.max_concurrency, len(chunks)))
+        logger.info(f"Summarizing transcript in {len(chunks)} chunks ({workers} concurrent)")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary-map") as executor:
+            partials = list(executor.map(bind_context(lambda chunk: self._map_chunk(chunk, video_title)), chunks))
+
+            level = 0
+            while len(partials) > 1 and count_tokens("\n\n".join(partials)) > self.notes_tokens:
+                groups = [partials[i:i + self.reduce_fanin] for i in range(0, len(partials), self.reduce_fanin)]
+                level += 1
+                logger.info(f"Reduce level {level}: {len(partials)} partial notes into {len(groups)}")
+                partials = list(executor.map(bind_context(lambda group: self._reduce(group, video_title)), groups))
+
+        return "\n\n".join(partials)
+
+    def _map_chunk(self, segments, video_title):
+        # The prompt depends only on the chunk itself, so unchanged chunks hit the response cache
+        text = " ".join(segment["text"].strip() for segment in segments)
+        start, end = segments[0].get("start"), segments[-1].get("end")
+        time_range = f"{format_time(start)} - {format_time(end)}" if start is not None and end is not None else "unknown"
+
+        prompt = f"""
+        Summarize this part of an educational video transcript.
+
+        Title: {video_title}
+        Time Range: {time_range}
+        Content: {text}
+
+        Write 3-6 short bullet points of the key topics and concepts, each starting with
+        the approximate time it is discussed (MM:SS) when the time range is known.
+
+        Notes:"""
+
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant. Write concise, factual lecture notes."},
+            {"role": "user", "content": prompt}
+        ]
+        notes = self.gpt._make_api_call(messages, max_tokens=250, temperature=0.2)
+        return f"[{time_range}]\n{notes}"
+
+    def _reduce(self, partials, video_title):
+        prompt = f"""
+        Merge these consecutive notes from one educational video into a single set of notes.
+
+        Title: {video_title}
+
+        {chr(10).join(partials)}
+
+        Keep the MM:SS times and the order, drop repetition, and keep every distinct topic.
+
+        Merged notes:"""
+
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant. Write concise, factual lecture notes."},
+            {"role": "user", "content": prompt}
+        ]
+        return self.gpt._make_api_call(messages, max_tokens=400, temperature=0.2)
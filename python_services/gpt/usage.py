@@ -0,0 +1,100 @@
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Meter of the request currently being served; worker threads see it through bind_context
+_current_meter = contextvars.ContextVar('gpt_usage_meter', default=None)
+
+
+class UsageMeter:
+    """Tokens, request count and API time spent on GPT calls within one measure_usage() block"""
+
+    def __init__(self):
+        self.requests = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.api_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens=0, completion_tokens=0, seconds=0.0, cached=False):
+        with self._lock:
+            if cached:
+                self.cached += 1
+                return
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.api_seconds += seconds
+
+    def summary(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "cached_requests": self.cached,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + self.completion_tokens,
+                "api_seconds": round(self.api_seconds, 3)
+            }
+
+
+@contextmanager
+def measure_usage():
+    meter = UsageMeter()
+    token = _current_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _current_meter.reset(token)
+
+
+def record_usage(prompt_tokens=0, completion_tokens=0, seconds=0.0, cached=False):
+    meter = _current_meter.get()
+    if meter is not None:
+        meter.add(prompt_tokens, completion_tokens, seconds, cached)
+
+
+def bind_context(func):
+    """Wrap func so calls on other threads still record into the caller's usage meter"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+
+class UsageReport:
+    """Running averages per generation mode, so combined and separate runs can be compared"""
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def add_run(self, mode, usage, seconds):
+        with self._lock:
+            totals = self._runs.setdefault(mode, {"runs": 0, "requests": 0, "total_tokens": 0, "seconds": 0.0})
+            totals["runs"] += 1
+            totals["requests"] += usage["requests"]
+            totals["total_tokens"] += usage["total_tokens"]
+            totals["seconds"] += seconds
+
+    def stats(self):
+        with self._lock:
+            modes = {
+                mode: {
+                    "runs": totals["runs"],
+                    "avg_requests": round(totals["requests"] / totals["runs"], 2),
+                    "avg_tokens": round(totals["total_tokens"] / totals["runs"]),
+                    "avg_seconds": round(totals["seconds"] / totals["runs"], 2)
+                }
+                for mode, totals in self._runs.items()
+            }
+        report = {"modes": modes}
+        combined, separate = modes.get("combined"), modes.get("separate")
+        if combined and separate and separate["avg_tokens"] and separate["avg_seconds"]:
+            report["combined_savings"] = {
+                "tokens_percent": round(100 * (1 - combined["avg_tokens"] / separate["avg_tokens"]), 1),
+                "latency_percent": round(100 * (1 - combined["avg_seconds"] / separate["avg_seconds"]), 1)
+            }
+        return report
@@ -0,0 +1 @@
+# Background jobs for long-running video processing 
\ No newline at end of file
@@ -0,0 +1,151 @@
+import os
+import uuid
+import logging
+import threading
+import traceback
+from jobs.job_store import MAX_ATTEMPTS
+from gpt.retry_policy import is_fatal_api_error
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_SECONDS', '10'))
+# A running job without a heartbeat for this long is assumed to have lost its worker
+HEARTBEAT_TIMEOUT = float(os.getenv('JOB_HEARTBEAT_TIMEOUT_SECONDS', '60'))
+POLL_INTERVAL = 2.0
+# Pause before a job whose handler raised is queued again (it resumes after its finished stages)
+RETRY_DELAY = float(os.getenv('JOB_RETRY_DELAY_SECONDS', '5'))
+
+
+class NonRetryableJobError(Exception):
+    """Raised by a job handler when another attempt cannot succeed (missing video, invalid parameters)"""
+
+
+def is_retryable(error):
+    """Whether a job whose handler raised error may succeed on another attempt
+
+    GPT calls wrap the API error in their own exception, so the whole cause/context
+    chain is checked.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, NonRetryableJobError) or is_fatal_api_error(error):
+            return False
+        error = error.__cause__ or error.__context__
+    return True
+
+
+class JobContext:
+    """Handed to a job handler: its parameters, stages finished by earlier attempts, and a progress hook"""
+
+    def __init__(self, store, job):
+        self.store = store
+        self.job_id = job["id"]
+        self.params = job["params"]
+        self.completed_stages = store.get_stage_results(job["id"])
+
+    def record_stage(self, stage, result, seconds, total_stages):
+        self.completed_stages[stage] = result
+        progress = min(1.0, len(self.completed_stages) / max(1, total_stages))
+        self.store.save_stage(self.job_id, stage, result, seconds, progress)
+
+
+class JobManager:
+    """Pool of background worker threads executing jobs from a JobStore
+
+    handlers maps a job kind to a callable taking a JobContext and returning a
+    JSON-serialisable result. A job whose handler raises is retried until it has
+    been attempted MAX_ATTEMPTS times (crashed attempts count too), then marked failed;
+    errors no retry can fix (see is_retryable) fail the job straight away.
+    """
+
+    def __init__(self, store, handlers, workers=DEFAULT_WORKERS):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads or self.workers <= 0:
+                return
+            self._start()
+
+    def _start(self):
+        # Pick up jobs orphaned by a previous crash of this or another process
+        self.store.requeue_stale(HEARTBEAT_TIMEOUT)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        monitor = threading.Thread(target=self._monitor_loop, name="job-monitor", daemon=True)
+        monitor.start()
+        self._threads.append(monitor)
+        logger.info(f"Started {self.workers} job workers ({self.worker_id})")
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def submit(self, kind, params):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = self.store.create_job(kind, params, dedupe=True)
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get_job(job_id)
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            job = self.store.claim_next(self.worker_id)
+            if job is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job):
+        job_id = job["id"]
+        with self._active_lock:
+            self._active.add(job_id)
+        try:
+            context = JobContext(self.store, job)
+            if context.completed_stages:
+                logger.info(f"Resuming job {job_id} after stages: {sorted(context.completed_stages)}")
+            result = self.handlers[job["kind"]](context)
+            self.store.complete(job_id, result)
+            logger.info(f"Job {job_id} succeeded")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed (attempt {job['attempts']}):\n" + traceback.format_exc())
+            if not is_retryable(e):
+                self.store.fail(job_id, str(e))
+            elif job["attempts"] < MAX_ATTEMPTS and not self._stop.wait(RETRY_DELAY):
+                self.store.retry(job_id, str(e))
+                self._wakeup.set()
+            else:
+                self.store.fail(job_id, str(e))
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+
+    def _monitor_loop(self):
+        """Heartbeat our running jobs and requeue ones abandoned by dead workers"""
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self._active_lock:
+                    active = list(self._active)
+                if active:
+                    self.store.heartbeat(active)
+                if self.store.requeue_stale(HEARTBEAT_TIMEOUT):
+                    self._wakeup.set()
+            except Exception as e:
+                logger.error(f"Job monitor error: {str(e)}")
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv(
+    'JOB_DB_PATH',
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'jobs.sqlite3')
+)
+MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_stages (
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    result TEXT,
+    seconds REAL,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+
+
+class JobStore:
+    """SQLite-backed job table; stage results are stored as they finish so a job can resume"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = os.path.abspath(db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create_job(self, kind, params, dedupe=False):
+        """Insert a queued job; with dedupe, return the ID of an identical queued/running job instead"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        params_json = json.dumps(params, sort_keys=True)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if dedupe:
+                    row = conn.execute(
+                        "SELECT id FROM jobs WHERE kind = ? AND params = ? AND status IN ('queued', 'running') "
+                        "ORDER BY created_at LIMIT 1",
+                        (kind, params_json)
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute("COMMIT")
+                        logger.info(f"Reusing in-flight job {row['id']} for identical {kind} request")
+                        return row["id"]
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, params, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                    (job_id, kind, params_json, now, now)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            job = self._row_to_job(row)
+            if job:
+                job["stages"] = [r["stage"] for r in conn.execute(
+                    "SELECT stage FROM job_stages WHERE job_id = ? ORDER BY finished_at", (job_id,)
+                )]
+        return job
+
+    def claim_next(self, worker_id):
+        """Atomically move the oldest queued job to running and return it"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker_id = ?, heartbeat_at = ?, updated_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker_id, now, now, row["id"])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job["attempts"] += 1
+        return job
+
+    def heartbeat(self, job_ids):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                [(now, job_id) for job_id in job_ids]
+            )
+
+    def save_stage(self, job_id, stage, result, seconds, progress):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_stages (job_id, stage, result, seconds, finished_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, stage, json.dumps(result), seconds, now)
+            )
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ?, heartbeat_at = ? WHERE id = ?",
+                (progress, now, now, job_id)
+            )
+
+    def get_stage_results(self, job_id):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT stage, result FROM job_stages WHERE job_id = ?", (job_id,)).fetchall()
+        return {row["stage"]: json.loads(row["result"]) for row in rows}
+
+    def complete(self, job_id, result):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'succeeded', progress = 1, result = ?, updated_at = ?, finished_at = ? "
+                "WHERE id = ?",
+                (json.dumps(result), now, now, job_id)
+            )
+
+    def fail(self, job_id, error):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                (error, now, now, job_id)
+            )
+
+    def retry(self, job_id, error):
+        """Put a failed attempt back in the queue, keeping its stage results and the error for reference"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker_id = NULL, error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id)
+            )
+
+    def requeue_stale(self, heartbeat_timeout):
+        """Requeue running jobs whose worker stopped heartbeating (crashed); fail them after MAX_ATTEMPTS"""
+        now = time.time()
+        cutoff = now - heartbeat_timeout
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Worker crashed too many times', "
+                    "updated_at = ?, finished_at = ? WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                    (now, now, cutoff, MAX_ATTEMPTS)
+                ).rowcount
+                requeued = conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker_id = NULL, updated_at = ? "
+                    "WHERE status = 'running' AND heartbeat_at < ?",
+                    (now, cutoff)
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if requeued or failed:
+            logger.warning(f"Requeued {requeued} stale jobs, failed {failed} after {MAX_ATTEMPTS} attempts")
+        return requeued
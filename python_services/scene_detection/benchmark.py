@@ -0,0 +1,81 @@
+"""Compare scene detection speed presets against the full-rate ("accurate") run
+
+Run from python_services/:
+
+    python -m scene_detection.benchmark lecture.mp4 [more.mp4 ...] --tolerance 1.0
+
+For every preset it reports wall time, speedup, and how well its scene boundaries match
+the accurate run: a boundary counts as found when one lies within --tolerance seconds.
+"""
+import json
+import time
+import argparse
+import logging
+from scene_detection.scene_detector import SceneDetector, SPEED_PRESETS
+
+
+def match_boundaries(reference, candidate, tolerance):
+    """Greedy one-to-one matching of boundary times; returns (matched offsets, precision, recall)"""
+    unmatched = list(candidate)
+    offsets = []
+    for boundary in reference:
+        if not unmatched:
+            break
+        closest = min(unmatched, key=lambda c: abs(c - boundary))
+        if abs(closest - boundary) <= tolerance:
+            offsets.append(abs(closest - boundary))
+            unmatched.remove(closest)
+    precision = len(offsets) / len(candidate) if candidate else 1.0
+    recall = len(offsets) / len(reference) if reference else 1.0
+    return offsets, precision, recall
+
+
+def benchmark(video_path, threshold=27.0, min_scene_length=1.0, tolerance=1.0, detector=None):
+    detector = detector or SceneDetector()
+    runs = {}
+    for speed in SPEED_PRESETS:
+        started = time.time()
+        scenes = detector.detect_scenes(video_path, threshold, min_scene_length, speed=speed)
+        runs[speed] = (time.time() - started, [scene["start_time"] for scene in scenes[1:]])
+
+    reference_seconds, reference = runs["accurate"]
+    report = {"video": video_path, "reference_boundaries": len(reference), "presets": {}}
+    for speed, (seconds, boundaries) in runs.items():
+        offsets, precision, recall = match_boundaries(reference, boundaries, tolerance)
+        report["presets"][speed] = {
+            "seconds": round(seconds, 2),
+            "speedup": round(reference_seconds / seconds, 2) if seconds else None,
+            "boundaries": len(boundaries),
+            "precision": round(precision, 3),
+            "recall": round(recall, 3),
+            "mean_offset_seconds": round(sum(offsets) / len(offsets), 3) if offsets else None
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scene detection speed presets")
+    parser.add_argument('videos', nargs='+')
+    parser.add_argument('--threshold', type=float, default=27.0)
+    parser.add_argument('--min-scene-length', type=float, default=1.0)
+    parser.add_argument('--tolerance', type=float, default=1.0, help="seconds a boundary may be off and still match")
+    parser.add_argument('--json', action='store_true', help="print the raw report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    detector = SceneDetector()
+    for video_path in args.videos:
+        report = benchmark(video_path, args.threshold, args.min_scene_length, args.tolerance, detector)
+        if args.json:
+            print(json.dumps(report, indent=2))
+            continue
+        print(f"{video_path} ({report['reference_boundaries']} boundaries at full rate)")
+        print(f"  {'preset':<10}{'seconds':>9}{'speedup':>9}{'found':>7}{'precision':>11}{'recall':>8}{'offset':>8}")
+        for speed, row in report["presets"].items():
+            offset = f"{row['mean_offset_seconds']:.2f}" if row['mean_offset_seconds'] is not None else "-"
+            print(f"  {speed:<10}{row['seconds']:>9.2f}{row['speedup']:>8.2f}x{row['boundaries']:>7}"
+                  f"{row['precision']:>11.3f}{row['recall']:>8.3f}{offset:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import os
+import json
+import glob
+import time
+import hashlib
+import logging
+import threading
+import scenedetect
+from common.file_hash import hash_file
+from scene_detection.scene_analysis import SceneAnalysis, ADAPTIVE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv(
+    'SCENE_METRICS_CACHE_DIR',
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'scene_metrics')
+)
+DEFAULT_MAX_SIZE_MB = float(os.getenv('SCENE_METRICS_CACHE_MAX_MB', '200'))
+# Working copies of videos being analysed in the background older than this were left by a dead process
+STALE_PENDING_SECONDS = float(os.getenv('SCENE_METRICS_STALE_PENDING_SECONDS', '3600'))
+
+# Bump when SceneDetector.analyze() records different metrics, so old entries stop matching
+METRICS_VERSION = 1
+
+
+class SceneMetricsCache:
+    """Disk cache of SceneAnalysis per-frame metrics keyed by video content hash, detector version and downscale
+
+    An hour of 25fps video is about 1MB, and answering a new threshold or min_scene_length
+    from it needs no decode at all.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.pending_dir = os.path.join(self.cache_dir, 'pending')
+        os.makedirs(self.pending_dir, exist_ok=True)
+        self._remove_stale_pending()
+
+    def pending_path(self, name):
+        """Path for a working copy of a video awaiting analysis; removed on startup if left behind"""
+        return os.path.join(self.pending_dir, name)
+
+    def _remove_stale_pending(self):
+        cutoff = time.time() - STALE_PENDING_SECONDS
+        for path in glob.glob(os.path.join(self.pending_dir, '*')):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    logger.info(f"Removed stale scene metrics working copy: {os.path.basename(path)}")
+            except OSError:
+                continue
+
+    def _variant_key(self, target_width):
+        payload = json.dumps({
+            "version": METRICS_VERSION,
+            "scenedetect": scenedetect.__version__,
+            "adaptive_window": ADAPTIVE_WINDOW,
+            "target_width": target_width
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def _entry_path(self, video_hash, target_width):
+        return os.path.join(self.cache_dir, f"{video_hash}_{self._variant_key(target_width)}.npz")
+
+    def get(self, video_path, target_width=None):
+        """Return the cached SceneAnalysis for this video and downscale, or None"""
+        try:
+            entry_path = self._entry_path(hash_file(video_path), target_width)
+            analysis = SceneAnalysis.load(entry_path)
+            # Touch the entry so eviction treats it as recently used
+            os.utime(entry_path, None)
+            with self._lock:
+                self.hits += 1
+            logger.info(f"Scene metrics cache hit for {video_path}")
+            return analysis
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable scene metrics cache entry for {video_path}: {str(e)}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+    def contains(self, video_path, target_width=None):
+        """Whether an entry exists for this video and downscale, without loading it or counting a hit/miss"""
+        try:
+            return os.path.exists(self._entry_path(hash_file(video_path), target_width))
+        except OSError:
+            return False
+
+    def put(self, video_path, target_width, analysis):
+        """Store a SceneAnalysis and evict old entries beyond the size limit"""
+        try:
+            entry_path = self._entry_path(hash_file(video_path), target_width)
+            # Write to a temp file first so concurrent readers never see a partial entry
+            tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                analysis.save(f)
+            os.replace(tmp_path, entry_path)
+            self._enforce_size_limit()
+        except Exception as e:
+            logger.warning(f"Failed to cache scene metrics for {video_path}: {str(e)}")
+
+    def _enforce_size_limit(self):
+        with self._lock:
+            entries = []
+            for path in glob.glob(os.path.join(self.cache_dir, '*.npz')):
+                try:
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                except FileNotFoundError:
+                    continue
+
+            total = sum(size for _, size, _ in entries)
+            # Oldest (least recently used) first
+            for _, size, path in sorted(entries):
+                if total <= self.max_size_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted scene metrics cache entry: {os.path.basename(path)}")
+                except FileNotFoundError:
+                    continue
+
+    def stats(self):
+        """Return hit/miss counters and current disk usage"""
+        paths = glob.glob(os.path.join(self.cache_dir, '*.npz'))
+        size = 0
+        for path in paths:
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "entries": len(paths),
+            "size_mb": round(size / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+            "hits": hits,
+            "misses": misses
+        }
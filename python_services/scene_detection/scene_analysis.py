@@ -0,0 +1,122 @@
+import numpy as np
+
+# The three scene_method values and their default thresholds (PySceneDetect's defaults, except content
+# which uses the service's usual 27)
+SCENE_METHODS = ("content", "adaptive", "threshold")
+DEFAULT_THRESHOLDS = {"content": 27.0, "adaptive": 3.0, "threshold": 12.0}
+# PySceneDetect's default min_scene_len, in frames
+MIN_SCENE_LEN_FRAMES = 15
+# AdaptiveDetector defaults
+ADAPTIVE_MIN_CONTENT_VAL = 15.0
+ADAPTIVE_WINDOW = 2
+# Threshold search grid per method for auto mode: (lowest, highest, step)
+AUTO_THRESHOLD_RANGES = {"content": (5.0, 80.0, 0.5), "adaptive": (1.0, 15.0, 0.1), "threshold": (2.0, 60.0, 0.5)}
+
+
+def _greedy_cuts(candidates, min_gap, last_cut=None):
+    """Keep candidate frames at least min_gap after the previously kept one"""
+    cuts = []
+    for frame in candidates:
+        if last_cut is None or frame - last_cut >= min_gap:
+            cuts.append(int(frame))
+            last_cut = frame
+    return cuts
+
+
+class SceneAnalysis:
+    """Per-frame metrics from one decode, from which any detector's cuts can be derived
+
+    content_val and adaptive_ratio are ContentDetector/AdaptiveDetector's frame scores and
+    brightness is ThresholdDetector's average_rgb, as recorded by PySceneDetect's StatsManager.
+    cuts() reproduces each detector's decision rule over these arrays, so changing the method
+    or threshold never needs another pass over the video.
+    """
+
+    def __init__(self, fps, duration, content_val, adaptive_ratio, brightness):
+        self.fps = float(fps)
+        self.duration = float(duration)
+        self.content_val = np.asarray(content_val, dtype=np.float32)
+        self.adaptive_ratio = np.asarray(adaptive_ratio, dtype=np.float32)
+        self.brightness = np.asarray(brightness, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.content_val)
+
+    def save(self, file):
+        """Write the metrics as an uncompressed .npz (about 12 bytes per frame)"""
+        np.savez(file, fps=self.fps, duration=self.duration, content_val=self.content_val,
+                 adaptive_ratio=self.adaptive_ratio, brightness=self.brightness)
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as data:
+            return cls(float(data["fps"]), float(data["duration"]), data["content_val"],
+                       data["adaptive_ratio"], data["brightness"])
+
+    def cut_frames(self, method="content", threshold=None, min_scene_len=MIN_SCENE_LEN_FRAMES):
+        """Frame numbers where the given detector would cut"""
+        if method not in SCENE_METHODS:
+            raise ValueError(f"Unknown scene method: {method}")
+        threshold = DEFAULT_THRESHOLDS[method] if threshold is None else float(threshold)
+
+        if method == "content":
+            # The first analysed frame counts as the previous cut
+            return _greedy_cuts(np.flatnonzero(self.content_val >= threshold), min_scene_len, last_cut=0)
+
+        if method == "adaptive":
+            candidates = np.flatnonzero(
+                (self.adaptive_ratio >= threshold) & (self.content_val >= ADAPTIVE_MIN_CONTENT_VAL)
+            )
+            return _greedy_cuts(candidates, min_scene_len)
+
+        # Threshold (fade) detection: a cut halfway between a fade out and the following fade in
+        if len(self.brightness) == 0:
+            return []
+        below = self.brightness < threshold
+        cuts = []
+        last_cut = 0
+        fade_out = None if not below[0] else 0
+        for frame in np.flatnonzero(below[1:] != below[:-1]) + 1:
+            if below[frame]:
+                fade_out = frame
+            elif fade_out is not None:
+                if frame - last_cut >= min_scene_len:
+                    cuts.append(int((frame + fade_out) / 2))
+                    last_cut = frame
+                fade_out = None
+        return cuts
+
+    def cuts(self, method="content", threshold=None, min_scene_len=MIN_SCENE_LEN_FRAMES):
+        """Cut times in seconds"""
+        return [frame / self.fps for frame in self.cut_frames(method, threshold, min_scene_len)]
+
+    def scene_times(self, method="content", threshold=None, min_scene_len=MIN_SCENE_LEN_FRAMES):
+        """(start_seconds, end_seconds) per scene; empty when there is no cut, like scenedetect.detect()"""
+        cuts = self.cuts(method, threshold, min_scene_len)
+        if not cuts:
+            return []
+        boundaries = [0.0] + cuts + [self.duration]
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def scene_count(self, method="content", threshold=None, min_scene_length=0.0):
+        """Number of scenes at least min_scene_length seconds long, as the API would return them"""
+        return sum(1 for start, end in self.scene_times(method, threshold) if end - start >= min_scene_length)
+
+    def auto_threshold(self, method, scenes_per_minute, min_scene_length=0.0):
+        """Threshold on the method's search grid whose scene count is closest to scenes_per_minute
+
+        A threshold that finds no cut (and so no scenes) only wins when every threshold does;
+        ties go to the threshold nearest the method's default. Returns (threshold, scene count).
+        """
+        if method not in SCENE_METHODS:
+            raise ValueError(f"Unknown scene method: {method}")
+        target = scenes_per_minute * self.duration / 60.0
+        lowest, highest, step = AUTO_THRESHOLD_RANGES[method]
+        best = None
+        for threshold in np.arange(lowest, highest + step / 2, step):
+            threshold = round(float(threshold), 2)
+            count = self.scene_count(method, threshold, min_scene_length)
+            rank = (count == 0, abs(count - target), abs(threshold - DEFAULT_THRESHOLDS[method]))
+            if best is None or rank < best[0]:
+                best = (rank, threshold, count)
+        return best[1], best[2]
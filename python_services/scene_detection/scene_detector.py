@@ -1,20 +1,153 @@
 import os
+import math
 import logging
-from scenedetect import detect, ContentDetector, AdaptiveDetector, ThresholdDetector
+import threading
+import multiprocessing
+import contextlib
+import shutil
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from scenedetect import detect, open_video, ContentDetector, AdaptiveDetector, ThresholdDetector
 from scenedetect.scene_manager import save_images
 from scenedetect.stats_manager import StatsManager
 from scenedetect.detectors import ContentDetector
 from scenedetect.scene_manager import SceneManager
 from scenedetect.frame_timecode import FrameTimecode
 from scenedetect.video_splitter import split_video_ffmpeg
+from scene_detection.scene_analysis import SceneAnalysis, SCENE_METHODS, ADAPTIVE_WINDOW
+from scene_detection.metrics_cache import SceneMetricsCache
+from common.file_hash import hash_file, forget_file
 
 logger = logging.getLogger(__name__)
 
+# Analysis speed tiers. target_fps: frames per second actually analysed (None = every frame);
+# target_width: frame width after downscaling (None = PySceneDetect's automatic downscale)
+SPEED_PRESETS = {
+    "accurate": {"target_fps": None, "target_width": None},
+    "balanced": {"target_fps": 5.0, "target_width": 256},
+    "fast": {"target_fps": 2.0, "target_width": 160}
+}
+DEFAULT_SPEED = os.getenv('SCENE_DETECTION_SPEED', 'accurate')
+
+# Time-sharded detection: worker processes per video, and videos shorter than this are not split
+DEFAULT_SHARDS = int(os.getenv('SCENE_DETECTION_SHARDS', str(min(4, os.cpu_count() or 1))))
+SHARDED_MIN_SECONDS = float(os.getenv('SCENE_DETECTION_SHARDED_MIN_SECONDS', '300'))
+# Extra video analysed on each side of a shard so detectors are warmed up at its edges
+SHARD_OVERLAP_SECONDS = float(os.getenv('SCENE_DETECTION_SHARD_OVERLAP_SECONDS', '3.0'))
+# Scene density the auto threshold aims for
+DEFAULT_SCENES_PER_MINUTE = float(os.getenv('SCENE_AUTO_SCENES_PER_MINUTE', '1.0'))
+# Metrics-cache fills running at once in the background (see SceneDetector.analyze_in_background)
+BACKGROUND_ANALYSES = int(os.getenv('SCENE_METRICS_BACKGROUND_ANALYSES', '1'))
+# PySceneDetect's default min_scene_len: cuts closer than this (in frames) are the same cut
+MIN_CUT_GAP_FRAMES = 15
+
+_shard_pools = {}
+_shard_pools_lock = threading.Lock()
+
+
+def _speed_preset(speed):
+    speed = speed or DEFAULT_SPEED
+    if speed not in SPEED_PRESETS:
+        raise ValueError(f"Unknown scene detection speed: {speed}")
+    return speed, SPEED_PRESETS[speed]
+
+
+class _BrightnessDetector(ThresholdDetector):
+    """ThresholdDetector that never lets the SceneManager skip decoding a frame
+
+    SceneManager asks whether the frame *before* the one it is about to read still needs
+    processing; once ThresholdDetector has stored that frame's brightness it says no, and
+    the next frame reaches every detector as a copy of the previous one.
+    """
+
+    def is_processing_required(self, frame_num):
+        return True
+
+
+def _scene_manager(video, detector, speed, stats_manager=None):
+    """SceneManager with the downscale of a speed preset; returns (scene_manager, frame_skip)"""
+    speed, preset = _speed_preset(speed)
+    scene_manager = SceneManager(stats_manager)
+    scene_manager.add_detector(detector)
+    frame_skip = 0
+    if preset["target_width"] is not None:
+        scene_manager.auto_downscale = False
+        scene_manager.downscale = max(1, video.frame_size[0] // preset["target_width"])
+    if preset["target_fps"] is not None:
+        frame_skip = max(0, int(round(video.frame_rate / preset["target_fps"])) - 1)
+    return scene_manager, frame_skip
+
+
+def _detect_shard(video_path, detector, speed, start, end):
+    """Cut times (seconds) PySceneDetect finds in [start, end) of a video; runs in a worker process"""
+    video = open_video(video_path)
+    scene_manager, frame_skip = _scene_manager(video, detector, speed)
+    # Start on the same frame grid a single pass with frame_skip would sample
+    step = frame_skip + 1
+    start_frame = int(start * video.frame_rate) // step * step
+    if start_frame > 0:
+        # OpenCV seeks to the preceding keyframe and decodes forward to the exact frame
+        video.seek(start_frame)
+    scene_manager.detect_scenes(video=video, end_time=end, frame_skip=frame_skip)
+    return [scene_start.get_seconds() for scene_start, _ in scene_manager.get_scene_list()[1:]]
+
+
+def get_shard_pool(workers):
+    """Return a long-lived process pool for shard detection"""
+    with _shard_pools_lock:
+        pool = _shard_pools.get(workers)
+        if pool is None:
+            # spawn avoids inheriting Flask/OpenCV thread state from the parent
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _shard_pools[workers] = pool
+            logger.info(f"Started {workers} scene detection worker processes")
+        return pool
+
+
+def plan_shards(duration, shards, overlap=SHARD_OVERLAP_SECONDS):
+    """Return (scan_start, scan_end, own_start, own_end) second ranges for equal time shards
+
+    Each shard is scanned with the overlap on both sides; only cuts inside its owned
+    range are kept, so a cut at a shard edge is reported by exactly one shard.
+    """
+    length = duration / shards
+    plan = []
+    for i in range(shards):
+        own_start = i * length
+        own_end = duration if i == shards - 1 else (i + 1) * length
+        plan.append((max(0.0, own_start - overlap), min(duration, own_end + overlap), own_start, own_end))
+    return plan
+
+
+def merge_shard_cuts(plan, shard_cuts, min_gap):
+    """Keep each shard's cuts inside its owned range, then drop cuts within min_gap of the previous one"""
+    cuts = sorted(
+        cut
+        for (_, _, own_start, own_end), cuts_in_shard in zip(plan, shard_cuts)
+        for cut in cuts_in_shard
+        if own_start <= cut < own_end
+    )
+    merged = []
+    for cut in cuts:
+        if merged and cut - merged[-1] < min_gap:
+            continue
+        merged.append(cut)
+    return merged
+
 class SceneDetector:
-    def __init__(self):
+    def __init__(self, shards=DEFAULT_SHARDS, metrics_cache=None, slot=None, idle_slot=None):
+        """slot: zero-argument callable returning a context manager held around every decode
+        (each shard takes its own), e.g. an admission "cpu" slot. idle_slot: the same, but
+        yielding whether a slot was free right now; background analyses only run when it was."""
         self.supported_formats = {'mp4', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm'}
+        self.shards = max(1, shards)
+        self.metrics_cache = metrics_cache or SceneMetricsCache()
+        self.slot = slot or contextlib.nullcontext
+        self.idle_slot = idle_slot or (lambda: contextlib.nullcontext(True))
+        self._warming = set()
+        self._warming_lock = threading.Lock()
     
-    def detect_scenes(self, video_path, threshold=35.0, min_scene_length=0.5):
+    def detect_scenes(self, video_path, threshold=35.0, min_scene_length=0.5, speed=None):
         """
         Detect scenes in a video using PySceneDetect - Optimized for speed and memory
         
@@ -22,6 +155,7 @@ class SceneDetector:
             video_path (str): Path to the video file
             threshold (float): Content detection threshold (default: 35.0 - higher for faster detection)
             min_scene_length (float): Minimum scene length in seconds (default: 0.5 - shorter for more scenes)
+            speed (str): Analysis preset from SPEED_PRESETS (default: SCENE_DETECTION_SPEED)
         
         Returns:
             list: List of scene timestamps in format [{"time_start": "00:00", "description": "Scene 1"}, ...]
@@ -38,34 +172,8 @@ class SceneDetector:
             except Exception:
                 pass  # Ignore file size check errors
             
-            # Use the modern detect function with optimized parameters
-            # Add memory optimization by limiting the number of frames processed
-            scene_list = detect(video_path, ContentDetector(threshold=threshold))
-            
-            # Convert to timestamp format
-            timestamps = []
-            for i, scene in enumerate(scene_list):
-                start_time = scene[0].get_seconds()
-                end_time = scene[1].get_seconds()
-                
-                # Skip scenes that are too short
-                if (end_time - start_time) < min_scene_length:
-                    continue
-                
-                # Convert seconds to MM:SS format
-                start_timestamp = self._seconds_to_timestamp(start_time)
-                
-                # Create description based on scene number and duration
-                duration = end_time - start_time
-                description = f"Scene {i+1} ({duration:.1f}s)"
-                
-                timestamps.append({
-                    "time_start": start_timestamp,
-                    "description": description,
-                    "start_time": start_time,
-                    "end_time": end_time,
-                    "duration": duration
-                })
+            scene_times = self._detect(video_path, ContentDetector(threshold=threshold), speed)
+            timestamps = self._build_timestamps(scene_times, min_scene_length)
             
             logger.info(f"Detected {len(timestamps)} scenes")
             return timestamps
@@ -78,35 +186,15 @@ class SceneDetector:
                 return self._generate_fallback_timestamps(video_path)
             raise
     
-    def detect_scenes_adaptive(self, video_path, min_scene_length=1.0):
+    def detect_scenes_adaptive(self, video_path, min_scene_length=1.0, speed=None):
         """
         Detect scenes using adaptive threshold detection
         """
         try:
             logger.info(f"Detecting scenes with adaptive threshold: {video_path}")
             
-            # Use the modern detect function with AdaptiveDetector
-            scene_list = detect(video_path, AdaptiveDetector())
-            
-            timestamps = []
-            for i, scene in enumerate(scene_list):
-                start_time = scene[0].get_seconds()
-                end_time = scene[1].get_seconds()
-                
-                if (end_time - start_time) < min_scene_length:
-                    continue
-                
-                start_timestamp = self._seconds_to_timestamp(start_time)
-                duration = end_time - start_time
-                description = f"Scene {i+1} ({duration:.1f}s)"
-                
-                timestamps.append({
-                    "time_start": start_timestamp,
-                    "description": description,
-                    "start_time": start_time,
-                    "end_time": end_time,
-                    "duration": duration
-                })
+            scene_times = self._detect(video_path, AdaptiveDetector(), speed)
+            timestamps = self._build_timestamps(scene_times, min_scene_length)
             
             logger.info(f"Detected {len(timestamps)} scenes with adaptive threshold")
             return timestamps
@@ -115,35 +203,15 @@ class SceneDetector:
             logger.error(f"Error detecting scenes with adaptive threshold: {str(e)}")
             raise
     
-    def detect_scenes_threshold(self, video_path, threshold=12, min_scene_length=1.0):
+    def detect_scenes_threshold(self, video_path, threshold=12, min_scene_length=1.0, speed=None):
         """
         Detect scenes using threshold-based detection
         """
         try:
             logger.info(f"Detecting scenes with threshold {threshold}: {video_path}")
             
-            # Use the modern detect function with ThresholdDetector
-            scene_list = detect(video_path, ThresholdDetector(threshold=threshold))
-            
-            timestamps = []
-            for i, scene in enumerate(scene_list):
-                start_time = scene[0].get_seconds()
-                end_time = scene[1].get_seconds()
-                
-                if (end_time - start_time) < min_scene_length:
-                    continue
-                
-                start_timestamp = self._seconds_to_timestamp(start_time)
-                duration = end_time - start_time
-                description = f"Scene {i+1} ({duration:.1f}s)"
-                
-                timestamps.append({
-                    "time_start": start_timestamp,
-                    "description": description,
-                    "start_time": start_time,
-                    "end_time": end_time,
-                    "duration": duration
-                })
+            scene_times = self._detect(video_path, ThresholdDetector(threshold=threshold), speed)
+            timestamps = self._build_timestamps(scene_times, min_scene_length)
             
             logger.info(f"Detected {len(timestamps)} scenes with threshold detection")
             return timestamps
@@ -152,6 +220,218 @@ class SceneDetector:
             logger.error(f"Error detecting scenes with threshold: {str(e)}")
             raise
     
+    def _detect(self, video_path, detector, speed=None):
+        """(start_seconds, end_seconds) of the scenes scenedetect.detect() finds, with the downscale and
+        frame skip of a speed preset, time-sharded for long videos
+        
+        Lecture recordings change slides a few times a minute, so analysing a couple of
+        small frames per second finds the same cuts (to within 1/target_fps) far faster.
+        """
+        speed, _ = _speed_preset(speed)
+        video = open_video(video_path)
+        duration = video.duration.get_seconds()
+        shards = self._shard_count(duration)
+        if shards > 1:
+            return self._detect_sharded(video_path, detector, speed, duration, video.frame_rate, shards)
+        
+        scene_manager, frame_skip = _scene_manager(video, detector, speed)
+        downscale = "auto" if scene_manager.auto_downscale else f"{scene_manager.downscale}x"
+        logger.info(f"Scene detection speed '{speed}': downscale {downscale}, frame_skip {frame_skip}")
+        with self.slot():
+            scene_manager.detect_scenes(video=video, frame_skip=frame_skip)
+        return [(start.get_seconds(), end.get_seconds()) for start, end in scene_manager.get_scene_list()]
+    
+    def _shard_count(self, duration):
+        """How many time shards _detect splits a video of this length into (1 = a single inline pass)"""
+        if self.shards == 1 or duration < SHARDED_MIN_SECONDS:
+            return 1
+        return min(self.shards, math.ceil(duration / (SHARDED_MIN_SECONDS / 2)))
+    
+    def shard_count(self, video_path):
+        """How many time shards detect_scenes* would use for this video"""
+        if self.shards == 1:
+            return 1
+        return self._shard_count(open_video(video_path).duration.get_seconds())
+    
+    def _detect_sharded(self, video_path, detector, speed, duration, fps, shards):
+        """_detect over time shards in a process pool; returns the same scene times as one pass
+        
+        Every shard gets its own copy of the (fresh) detector. Shards are scanned with
+        SHARD_OVERLAP_SECONDS of context on each side and only keep cuts in the range they
+        own, so cuts at shard edges are neither lost nor reported twice. Each shard is
+        submitted from this process once it holds its own slot, so a long video takes as
+        many slots as it keeps workers busy.
+        """
+        plan = plan_shards(duration, shards)
+        logger.info(f"Detecting scenes in {shards} time shards of {duration / shards:.0f}s")
+        
+        pool = get_shard_pool(self.shards)
+        
+        def run_shard(shard):
+            scan_start, scan_end, _, _ = shard
+            with self.slot():
+                return pool.submit(_detect_shard, video_path, detector, speed, scan_start, scan_end).result()
+        
+        with ThreadPoolExecutor(max_workers=shards, thread_name_prefix="scene-shard") as threads:
+            shard_cuts = list(threads.map(run_shard, plan))
+        cuts = merge_shard_cuts(plan, shard_cuts, MIN_CUT_GAP_FRAMES / fps)
+        if not cuts:
+            # Same as scenedetect.detect(): no cuts means no scene list
+            return []
+        
+        boundaries = [0.0] + cuts + [duration]
+        return list(zip(boundaries[:-1], boundaries[1:]))
+    
+    def analyze(self, video_path, speed=None):
+        """
+        Decode the video once and record every detector's per-frame metrics in a StatsManager
+        
+        AdaptiveDetector computes the content scores (content_val) and their adaptive ratio,
+        ThresholdDetector the frame brightness; the returned SceneAnalysis derives the cuts of
+        all three methods, at any threshold, from them. A StatsManager needs every frame, so
+        the speed preset only contributes its downscale here.
+        
+        Results are kept in the metrics cache, so analysing the same video again is a file read.
+        """
+        return self._analyze(video_path, speed, self.slot)
+    
+    def _analyze(self, video_path, speed, slot):
+        try:
+            _, preset = _speed_preset(speed)
+            analysis = self.metrics_cache.get(video_path, preset["target_width"])
+            if analysis is not None:
+                return analysis
+            
+            logger.info(f"Analysing frame metrics for all scene methods: {video_path}")
+            
+            video = open_video(video_path)
+            stats_manager = StatsManager()
+            scene_manager, _ = _scene_manager(video, AdaptiveDetector(window_width=ADAPTIVE_WINDOW), speed, stats_manager)
+            scene_manager.add_detector(_BrightnessDetector())
+            with slot():
+                frames = scene_manager.detect_scenes(video=video)
+            
+            keys = [ContentDetector.FRAME_SCORE_KEY,
+                    AdaptiveDetector.ADAPTIVE_RATIO_KEY_TEMPLATE.format(window_width=ADAPTIVE_WINDOW, luma_only=''),
+                    ThresholdDetector.THRESHOLD_VALUE_KEY]
+            metrics = np.zeros((frames, len(keys)), dtype=np.float32)
+            for frame in range(frames):
+                values = stats_manager.get_metrics(frame, keys)
+                metrics[frame] = [value if value is not None else 0.0 for value in values]
+            
+            analysis = SceneAnalysis(video.frame_rate, video.duration.get_seconds(),
+                                     metrics[:, 0], metrics[:, 1], metrics[:, 2])
+            logger.info(f"Analysed {frames} frames")
+            self.metrics_cache.put(video_path, preset["target_width"], analysis)
+            return analysis
+            
+        except Exception as e:
+            logger.error(f"Error analysing scenes: {str(e)}")
+            raise
+    
+    def has_analysis(self, video_path, speed=None):
+        """Whether analyze() would answer from the metrics cache without decoding"""
+        _, preset = _speed_preset(speed)
+        return self.metrics_cache.contains(video_path, preset["target_width"])
+    
+    def analyze_in_background(self, video_path, speed=None):
+        """Fill the metrics cache for a video on a background thread
+        
+        Only runs when an idle slot is free right now and fewer than BACKGROUND_ANALYSES are
+        running; otherwise the next request for the video decodes as usual. The analysis
+        runs on a hard link (or copy) of the file in the metrics cache's pending directory,
+        so the caller may delete video_path as soon as this returns.
+        """
+        _, preset = _speed_preset(speed)
+        key = (hash_file(video_path), preset["target_width"])
+        with self._warming_lock:
+            if key in self._warming or len(self._warming) >= BACKGROUND_ANALYSES:
+                return
+            self._warming.add(key)
+        
+        held = contextlib.ExitStack()
+        if not held.enter_context(self.idle_slot()):
+            self._finish_background(key, held, None)
+            return
+        
+        link_path = self.metrics_cache.pending_path(f"{key[0]}_{threading.get_ident()}{os.path.splitext(video_path)[1]}")
+        try:
+            try:
+                os.link(video_path, link_path)
+            except OSError:
+                shutil.copyfile(video_path, link_path)
+        except Exception as e:
+            logger.warning(f"Not caching scene metrics for {video_path}: {str(e)}")
+            self._finish_background(key, held, link_path)
+            return
+        
+        def run():
+            try:
+                # The idle slot is already held for the whole decode
+                self._analyze(link_path, speed, contextlib.nullcontext)
+            except Exception:
+                pass  # analyze() has logged it; the next request just decodes again
+            finally:
+                self._finish_background(key, held, link_path)
+        
+        threading.Thread(target=run, name="scene-metrics", daemon=True).start()
+    
+    def _finish_background(self, key, held, link_path):
+        held.close()
+        if link_path:
+            forget_file(link_path)
+            try:
+                os.remove(link_path)
+            except OSError:
+                pass
+        with self._warming_lock:
+            self._warming.discard(key)
+    
+    def scenes_from_analysis(self, analysis, method='content', threshold=None, min_scene_length=1.0):
+        """Scenes for one method and threshold from an analyze() result, in the detect_scenes format"""
+        return self._build_timestamps(analysis.scene_times(method, threshold), min_scene_length)
+    
+    def detect_scenes_all(self, video_path, min_scene_length=1.0, thresholds=None, speed=None):
+        """Scenes of every method from one decode: {"content": [...], "adaptive": [...], "threshold": [...]}"""
+        analysis = self.analyze(video_path, speed)
+        thresholds = thresholds or {}
+        return {
+            method: self.scenes_from_analysis(analysis, method, thresholds.get(method), min_scene_length)
+            for method in SCENE_METHODS
+        }
+    
+    def detect_scenes_auto(self, video_path, method='content', scenes_per_minute=None, min_scene_length=1.0, speed=None):
+        """
+        Detect scenes with the threshold that gives about scenes_per_minute scenes
+        
+        The search runs over the cached per-frame metrics (see analyze()), so it costs one
+        decode the first time and none after. Returns (scenes, chosen threshold).
+        """
+        scenes_per_minute = scenes_per_minute or DEFAULT_SCENES_PER_MINUTE
+        analysis = self.analyze(video_path, speed)
+        threshold, count = analysis.auto_threshold(method, scenes_per_minute, min_scene_length)
+        logger.info(f"Auto {method} threshold {threshold}: {count} scenes "
+                    f"(target {scenes_per_minute * analysis.duration / 60:.1f})")
+        return self.scenes_from_analysis(analysis, method, threshold, min_scene_length), threshold
+    
+    def _build_timestamps(self, scene_times, min_scene_length):
+        """Convert (start_seconds, end_seconds) pairs into the API timestamp format"""
+        timestamps = []
+        for i, (start_time, end_time) in enumerate(scene_times):
+            # Skip scenes that are too short
+            if (end_time - start_time) < min_scene_length:
+                continue
+            
+            duration = end_time - start_time
+            timestamps.append({
+                "time_start": self._seconds_to_timestamp(start_time),
+                "description": f"Scene {i+1} ({duration:.1f}s)",
+                "start_time": start_time,
+                "end_time": end_time,
+                "duration": duration
+            })
+        return timestamps
+    
     def _seconds_to_timestamp(self, seconds):
         """Convert seconds to MM:SS format"""
         minutes = int(seconds // 60)
@@ -185,18 +465,25 @@ class SceneDetector:
             
             # Find video stream and get fps
             fps = 30.0  # default
+            width = height = None
+            has_video = False
             for stream in data['streams']:
-                if stream['codec_type'] == 'video':
+                if stream['codec_type'] == 'video' and not has_video:
+                    has_video = True
+                    width, height = stream.get('width'), stream.get('height')
                     if 'r_frame_rate' in stream:
                         fps_parts = stream['r_frame_rate'].split('/')
-                        if len(fps_parts) == 2:
+                        if len(fps_parts) == 2 and float(fps_parts[1]) > 0:
                             fps = float(fps_parts[0]) / float(fps_parts[1])
-                    break
             
             return {
                 "duration": duration,
                 "fps": fps,
-                "duration_formatted": self._seconds_to_timestamp(duration)
+                "duration_formatted": self._seconds_to_timestamp(duration),
+                "width": width,
+                "height": height,
+                "has_audio": any(stream['codec_type'] == 'audio' for stream in data['streams']),
+                "has_video": has_video
             }
             
         except Exception as e:
@@ -205,7 +492,11 @@ class SceneDetector:
             return {
                 "duration": 0,
                 "fps": 30.0,
-                "duration_formatted": "00:00"
+                "duration_formatted": "00:00",
+                "width": None,
+                "height": None,
+                "has_audio": False,
+                "has_video": False
             }
     
     def combine_with_gpt_timestamps(self, scene_timestamps, gpt_timestamps, video_title=""):
@@ -354,4 +645,17 @@ class SceneDetector:
                 "start_time": 0,
                 "end_time": 60,
                 "duration": 60
-            }] 
\ No newline at end of file
+            }] 
+
+def detect_scenes_worker(video_path, threshold=35.0, min_scene_length=0.5, speed=None):
+    """Picklable entry point so detect_scenes can run in a worker process
+    
+    Runs a single pass: a pool worker must not fan out into a shard pool of its own.
+    """
+    return SceneDetector(shards=1).detect_scenes(video_path, threshold=threshold, min_scene_length=min_scene_length, speed=speed)
+
+
+def detect_scenes_auto_worker(video_path, method='content', scenes_per_minute=None, min_scene_length=1.0, speed=None):
+    """Picklable entry point for detect_scenes_auto; returns {"scenes": [...], "threshold": chosen threshold}"""
+    scenes, threshold = SceneDetector(shards=1).detect_scenes_auto(video_path, method, scenes_per_minute, min_scene_length, speed)
+    return {"scenes": scenes, "threshold": threshold}
@@ -0,0 +1,52 @@
+import os
+import pytest
+import requests
+
+# api.py refuses to import without an OpenAI key; no request is made here
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+import api
+from jobs import job_manager as job_manager_module
+from jobs.job_manager import JobManager
+from jobs.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def run_one(manager, store):
+    """Claim the next queued job and run it on this thread, as a worker would"""
+    job = store.claim_next(manager.worker_id)
+    manager._run_job(job)
+    return store.get_job(job["id"])
+
+
+def test_missing_video_job_fails_on_first_attempt(store, monkeypatch):
+    monkeypatch.setattr(api, "resolve_video", lambda video_id: (None, None))
+    # A retry would wait here; a non-retryable failure must not
+    monkeypatch.setattr(job_manager_module, "RETRY_DELAY", 60)
+    manager = JobManager(store, {"process-video": api.run_video_processing_job}, workers=0)
+    manager.submit("process-video", {"videoId": "missing", "features": ["summary"]})
+
+    job = run_one(manager, store)
+
+    assert job["status"] == "failed"
+    assert job["attempts"] == 1
+    assert job["error"] == "Video not found"
+
+
+def test_network_error_is_retried(store, monkeypatch):
+    def lookup_fails(video_id):
+        raise requests.exceptions.ConnectionError("Node server unreachable")
+
+    monkeypatch.setattr(api, "resolve_video", lookup_fails)
+    monkeypatch.setattr(job_manager_module, "RETRY_DELAY", 0)
+    manager = JobManager(store, {"process-video": api.run_video_processing_job}, workers=0)
+    manager.submit("process-video", {"videoId": "v1", "features": ["summary"]})
+
+    job = run_one(manager, store)
+
+    assert job["status"] == "queued"
+    assert job["attempts"] == 1
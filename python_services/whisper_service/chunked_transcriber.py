@@ -0,0 +1,291 @@
+import os
+import wave
+import logging
+import threading
+import multiprocessing
+import contextlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+DEFAULT_CHUNK_SECONDS = float(os.getenv('WHISPER_CHUNK_SECONDS', '120'))
+DEFAULT_OVERLAP_SECONDS = float(os.getenv('WHISPER_CHUNK_OVERLAP_SECONDS', '1.0'))
+DEFAULT_WORKERS = int(os.getenv('WHISPER_CHUNK_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Audio shorter than this is transcribed in one call; pool overhead is not worth it
+CHUNKED_MIN_SECONDS = float(os.getenv('WHISPER_CHUNKED_MIN_SECONDS', '300'))
+
+SILENCE_FRAME_MS = 30
+SILENCE_SMOOTHING_FRAMES = 10  # ~300ms, so we cut inside a pause rather than between syllables
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Set in each worker process by _init_worker
+_worker_model_name = None
+
+
+def load_wav(audio_path):
+    """Read a 16-bit mono WAV produced by VideoProcessor into a float32 array"""
+    with wave.open(audio_path, 'rb') as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"Expected 16-bit mono WAV, got {wav.getsampwidth() * 8}-bit x{wav.getnchannels()}")
+        if wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"Expected {SAMPLE_RATE}Hz WAV, got {wav.getframerate()}Hz")
+        frames = wav.readframes(wav.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def find_split_points(audio, sample_rate=SAMPLE_RATE, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                      search_window_seconds=15.0, first_chunk_seconds=None):
+    """Return sample offsets that split audio into ~chunk_seconds pieces at the quietest nearby point
+
+    first_chunk_seconds makes the first piece shorter so streaming callers see text sooner.
+    """
+    frame_len = int(sample_rate * SILENCE_FRAME_MS / 1000)
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return [0, len(audio)]
+
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1))
+    kernel = np.ones(SILENCE_SMOOTHING_FRAMES) / SILENCE_SMOOTHING_FRAMES
+    energy = np.convolve(energy, kernel, mode='same')
+
+    splits = [0]
+    last = 0
+    length = first_chunk_seconds or chunk_seconds
+    while True:
+        frames_per_chunk = int(length * 1000 / SILENCE_FRAME_MS)
+        window = min(int(search_window_seconds * 1000 / SILENCE_FRAME_MS), frames_per_chunk // 4)
+        if last + frames_per_chunk + window >= n_frames:
+            break
+        target = last + frames_per_chunk
+        lo, hi = target - window, target + window
+        cut = lo + int(np.argmin(energy[lo:hi]))
+        splits.append(cut * frame_len)
+        last = cut
+        length = chunk_seconds
+    splits.append(len(audio))
+    return splits
+
+
+def _init_worker(model_name, torch_threads):
+    """Load the model once per worker process so every chunk reuses it"""
+    global _worker_model_name
+    _worker_model_name = model_name
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    from whisper_service.model_registry import model_registry
+    model_registry.get_model(model_name)
+
+
+def _transcribe_chunk(audio, options):
+    from whisper_service.model_registry import model_registry
+    return model_registry.transcribe(audio, _worker_model_name, **options)
+
+
+def get_pool(model_name, workers):
+    """Return a long-lived process pool whose workers each hold model_name"""
+    key = (model_name, workers)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+            # spawn avoids inheriting Flask/torch thread state from the parent
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(model_name, torch_threads)
+            )
+            _pools[key] = pool
+            logger.info(f"Started {workers} Whisper worker processes for model '{model_name}'")
+        return pool
+
+
+def shutdown_pools():
+    """Stop all worker processes"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+class ChunkedTranscriber:
+    """Transcribe long audio by splitting at silences and decoding chunks in a process pool
+
+    slot is a zero-argument callable returning a context manager held while a chunk is
+    being decoded (e.g. an admission "cpu" slot), so every busy worker is accounted for.
+    """
+
+    def __init__(self, model_name="base", workers=DEFAULT_WORKERS, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                 overlap_seconds=DEFAULT_OVERLAP_SECONDS, slot=None):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.slot = slot or contextlib.nullcontext
+
+    def plan_chunks(self, audio, sample_rate=SAMPLE_RATE, first_chunk_seconds=None):
+        """Return (chunk_start, chunk_end, own_start, own_end) sample ranges
+
+        Each chunk is padded by the overlap on both sides so words at a cut are
+        decoded in full; only segments centred in the owned range are kept.
+        """
+        splits = find_split_points(audio, sample_rate, self.chunk_seconds,
+                                   first_chunk_seconds=first_chunk_seconds)
+        overlap = int(self.overlap_seconds * sample_rate)
+        chunks = []
+        for own_start, own_end in zip(splits[:-1], splits[1:]):
+            chunks.append((
+                max(0, own_start - overlap),
+                min(len(audio), own_end + overlap),
+                own_start,
+                own_end
+            ))
+        return chunks
+
+    def _iter_chunk_results(self, chunk_audio, options):
+        """Yield (chunk, whisper_result) in audio order as each chunk finishes
+
+        At most one chunk per worker is in flight, each submitted only once it holds
+        its own slot, so a lazy chunk_audio iterator keeps memory bounded.
+        """
+        # Worker processes share a console, so silence per-segment printing
+        options = dict(options, verbose=None)
+        if self.workers == 1:
+            from whisper_service.model_registry import model_registry
+            for chunk, audio in chunk_audio:
+                with self.slot():
+                    result = model_registry.transcribe(audio, self.model_name, **options)
+                yield chunk, result
+            return
+
+        pool = get_pool(self.model_name, self.workers)
+        pending = deque()
+        for chunk, audio in chunk_audio:
+            pending.append((chunk, self._submit(pool, audio, options)))
+            while pending and (len(pending) >= self.workers or pending[0][1].done()):
+                done_chunk, future = pending.popleft()
+                yield done_chunk, future.result()
+        while pending:
+            done_chunk, future = pending.popleft()
+            yield done_chunk, future.result()
+
+    def _submit(self, pool, audio, options):
+        """Submit one chunk once its slot is free; the slot is released when the chunk finishes"""
+        held = contextlib.ExitStack()
+        held.enter_context(self.slot())
+        try:
+            future = pool.submit(_transcribe_chunk, audio, options)
+        except BaseException:
+            held.close()
+            raise
+        future.add_done_callback(lambda _: held.close())
+        return future
+
+    def _iter_stitched(self, chunk_results, sample_rate):
+        self.language = None
+        previous = None
+        next_id = 0
+        for chunk, result in chunk_results:
+            self.language = self.language or result.get('language')
+            for seg in self._place_segments(chunk, result, previous, sample_rate):
+                seg['id'] = next_id
+                next_id += 1
+                previous = seg
+                yield seg
+
+    def iter_segments(self, audio, sample_rate=SAMPLE_RATE, first_chunk_seconds=None, **options):
+        """Yield stitched segments with absolute times as soon as their chunk is decoded
+
+        The detected language is available as self.language once iteration starts.
+        """
+        chunks = self.plan_chunks(audio, sample_rate, first_chunk_seconds)
+        logger.info(f"Transcribing {len(audio) / sample_rate:.0f}s of audio in {len(chunks)} chunks "
+                    f"across {self.workers} workers")
+        chunk_audio = ((chunk, audio[chunk[0]:chunk[1]]) for chunk in chunks)
+        yield from self._iter_stitched(self._iter_chunk_results(chunk_audio, options), sample_rate)
+
+    def iter_block_segments(self, blocks, sample_rate=SAMPLE_RATE, first_chunk_seconds=None, **options):
+        """Like iter_segments, but consumes audio as an iterator of blocks
+
+        Only about one chunk of audio plus the in-flight chunks is held in
+        memory, which is what lets multi-hour recordings be transcribed.
+        """
+        chunk_audio = self._cut_blocks(blocks, sample_rate, first_chunk_seconds)
+        yield from self._iter_stitched(self._iter_chunk_results(chunk_audio, options), sample_rate)
+
+    def _cut_blocks(self, blocks, sample_rate, first_chunk_seconds):
+        """Turn a stream of audio blocks into padded chunks cut at silences"""
+        overlap = int(self.overlap_seconds * sample_rate)
+        window_seconds = 15.0
+        buffer = np.empty(0, dtype=np.float32)
+        buffer_offset = 0  # absolute sample index of buffer[0]
+        tail = np.empty(0, dtype=np.float32)  # audio just before buffer, used as leading overlap
+        length = first_chunk_seconds or self.chunk_seconds
+
+        for block in blocks:
+            buffer = np.concatenate([buffer, block])
+            while len(buffer) >= int((length + window_seconds) * sample_rate) + overlap:
+                cut = find_split_points(buffer, sample_rate, length, window_seconds)[1]
+                chunk = (buffer_offset - len(tail), buffer_offset + cut + overlap,
+                         buffer_offset, buffer_offset + cut)
+                yield chunk, np.concatenate([tail, buffer[:cut + overlap]])
+                tail = buffer[max(0, cut - overlap):cut]
+                buffer = buffer[cut:]
+                buffer_offset += cut
+                length = self.chunk_seconds
+
+        if len(buffer):
+            chunk = (buffer_offset - len(tail), buffer_offset + len(buffer),
+                     buffer_offset, buffer_offset + len(buffer))
+            yield chunk, np.concatenate([tail, buffer])
+
+    def transcribe(self, audio, sample_rate=SAMPLE_RATE, **options):
+        """Return a Whisper-style result dict for the whole audio array"""
+        segments = list(self.iter_segments(audio, sample_rate, **options))
+        return build_result(segments, self.language)
+
+    def _place_segments(self, chunk, result, previous, sample_rate):
+        """Shift a chunk's segments to absolute time and drop overlap duplicates"""
+        start, _, own_start, own_end = chunk
+        offset = start / sample_rate
+        own_start_s = own_start / sample_rate
+        own_end_s = own_end / sample_rate
+
+        for seg in result.get('segments', []):
+            seg = dict(seg)
+            seg['start'] = seg['start'] + offset
+            seg['end'] = seg['end'] + offset
+            if 'words' in seg:
+                seg['words'] = [
+                    dict(word, start=word['start'] + offset, end=word['end'] + offset)
+                    for word in seg['words']
+                ]
+
+            midpoint = (seg['start'] + seg['end']) / 2
+            if not (own_start_s <= midpoint < own_end_s):
+                continue
+            # The same sentence decoded from both sides of a cut
+            if previous and seg['text'].strip() == previous['text'].strip() \
+                    and seg['start'] - previous['start'] < self.overlap_seconds * 2:
+                continue
+            previous = seg
+            yield seg
+
+
+def build_result(segments, language=None):
+    """Assemble a Whisper-style result dict from stitched segments"""
+    return {
+        "text": ''.join(seg['text'] for seg in segments),
+        "segments": segments,
+        "language": language
+    }
@@ -2,13 +2,15 @@ import sys
 import os
 from dotenv import load_dotenv
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-import whisper
 import json
 from moviepy.editor import VideoFileClip
 from scenedetect import VideoManager, SceneManager
 from scenedetect.detectors import ContentDetector
 from gpt.gpt_service import GPTService
+from common.transcript_index import TranscriptIndex
 from scene_detection.scene_detector import SceneDetector
+from whisper_service.model_registry import model_registry
+from whisper_service.whisper_service import WhisperService
 
 # Explicitly load the .env from python_services
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
@@ -27,8 +29,7 @@ def extract_audio(video_path, audio_path="temp_audio.wav"):
     return audio_path
 
 def transcribe_with_whisper(audio_path, model_name="base"):
-    model = whisper.load_model(model_name)
-    result = model.transcribe(audio_path, word_timestamps=True, verbose=True)
+    result = model_registry.transcribe(audio_path, model_name, word_timestamps=True, verbose=True)
     return result
 
 def detect_pauses(segments, min_pause_sec=1.0):
@@ -67,17 +68,17 @@ def generate_timestamps(segments, scene_times=None, pause_times=None, min_words=
         if scene_times:
             for t in scene_times:
                 if start <= t < end:
-            if buffer:
-                timestamps.append({'time': last_time, 'description': ' '.join(buffer)})
-                buffer = []
+                    if buffer:
+                        timestamps.append({'time': last_time, 'description': ' '.join(buffer)})
+                        buffer = []
                     last_time = t
                     matched = True
         if pause_times and not matched:
             for t in pause_times:
                 if start <= t < end:
-            if buffer:
-                timestamps.append({'time': last_time, 'description': ' '.join(buffer)})
-                buffer = []
+                    if buffer:
+                        timestamps.append({'time': last_time, 'description': ' '.join(buffer)})
+                        buffer = []
                     last_time = t
         buffer.append(text)
         if len(' '.join(buffer).split()) >= min_words:
@@ -100,11 +101,10 @@ def mmss_to_seconds(mmss):
     return 0
 
 def main(video_path, min_scene_length=1.0, max_scene_length=60.0):
-    # 1. Extract audio
-    audio_path = extract_audio(video_path)
-    # 2. Transcribe with Whisper (base)
-    result = transcribe_with_whisper(audio_path, model_name="base")
+    # 1-2. Extract audio and transcribe with Whisper (base), reusing cached transcripts
+    result = WhisperService().transcribe_video(video_path, "base", word_timestamps=True)
     segments = result['segments']
+    transcript_index = TranscriptIndex(segments)
     # 3. Detect scenes (PySceneDetect)
     scene_detector = SceneDetector()
     scenes = scene_detector.detect_scenes(video_path, min_scene_length=min_scene_length)
@@ -120,10 +120,8 @@ def main(video_path, min_scene_length=1.0, max_scene_length=60.0):
         scene_end = min(scene['end_time'], video_duration)
         if scene_start >= video_duration:
             continue  # skip any scene that starts after video ends
-        # Get all Whisper segments that overlap with this scene
-        scene_segments = [seg for seg in segments if isinstance(seg, dict) and seg['end'] > scene_start and seg['start'] < scene_end]
-        # Concatenate all text in the scene
-        scene_text = ' '.join(seg['text'] for seg in scene_segments if isinstance(seg, dict))
+        # Text spoken during this scene (bisect lookup over the Whisper segments)
+        scene_text = transcript_index.text(scene_start, scene_end)
         time_start = seconds_to_mmss(scene_start)
         description = gpt_service.generate_description(scene_text)
         timestamps.append({
@@ -140,9 +138,6 @@ def main(video_path, min_scene_length=1.0, max_scene_length=60.0):
         'timestamps': timestamps
     }
     print(json.dumps(output, ensure_ascii=False, indent=2))
-    # Clean up
-    if os.path.exists(audio_path):
-        os.remove(audio_path)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
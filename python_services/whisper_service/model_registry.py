@@ -0,0 +1,131 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Approximate resident size of each Whisper checkpoint once loaded (fp32, MB)
+MODEL_SIZES_MB = {
+    'tiny': 150,
+    'tiny.en': 150,
+    'base': 300,
+    'base.en': 300,
+    'small': 950,
+    'small.en': 950,
+    'medium': 3000,
+    'medium.en': 3000,
+    'large': 6000,
+}
+
+DEFAULT_MEMORY_BUDGET_MB = int(os.getenv('WHISPER_MODEL_MEMORY_MB', '1500'))
+
+
+def model_size_mb(model_name):
+    """Approximate resident size of a loaded Whisper model (unknown names count as large)"""
+    return MODEL_SIZES_MB.get(model_name, MODEL_SIZES_MB['large'])
+
+
+def import_whisper():
+    """Import whisper with error handling"""
+    try:
+        # Try importing from openai_whisper specifically
+        import openai_whisper as whisper
+        return whisper
+    except ImportError:
+        try:
+            # Fallback to regular whisper import
+            import whisper
+            return whisper
+        except ImportError as e:
+            logger.error(f"Whisper import failed: {e}")
+            raise ImportError("OpenAI Whisper is not installed. Run: pip install openai-whisper")
+
+
+class WhisperModelRegistry:
+    """Process-wide cache of loaded Whisper models with LRU eviction under a memory budget"""
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._inference_locks = {}
+        self._whisper = None
+
+    def _estimate_size_mb(self, model_name):
+        return model_size_mb(model_name)
+
+    def _used_mb(self):
+        return sum(self._estimate_size_mb(name) for name in self._models)
+
+    def _evict_for(self, model_name):
+        """Evict least recently used models until model_name fits in the budget (lock held)"""
+        needed = self._estimate_size_mb(model_name)
+        while self._models and self._used_mb() + needed > self.memory_budget_mb:
+            evicted_name, _ = self._models.popitem(last=False)
+            logger.info(f"Evicting Whisper model '{evicted_name}' to stay within {self.memory_budget_mb}MB budget")
+        if needed > self.memory_budget_mb:
+            logger.warning(f"Whisper model '{model_name}' (~{needed}MB) exceeds the {self.memory_budget_mb}MB budget on its own")
+
+    def get_model(self, model_name="base"):
+        """Return a loaded model, loading it once per process on first use"""
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is not None:
+                self._models.move_to_end(model_name)
+                return model
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        # Load outside the registry lock so other sizes stay available meanwhile;
+        # the per-name lock makes concurrent first requests share a single load.
+        with load_lock:
+            with self._lock:
+                model = self._models.get(model_name)
+                if model is not None:
+                    self._models.move_to_end(model_name)
+                    return model
+
+            if self._whisper is None:
+                self._whisper = import_whisper()
+            logger.info(f"Loading Whisper model: {model_name}")
+            model = self._whisper.load_model(model_name)
+            logger.info(f"Whisper model '{model_name}' loaded successfully")
+
+            with self._lock:
+                self._evict_for(model_name)
+                self._models[model_name] = model
+            return model
+
+    def transcribe(self, audio, model_name="base", **options):
+        """Transcribe with a shared model, serialising calls that use the same instance"""
+        model = self.get_model(model_name)
+        with self._lock:
+            inference_lock = self._inference_locks.setdefault(model_name, threading.Lock())
+        # Whisper installs kv-cache hooks on the model for each decode, so two
+        # concurrent transcribe() calls on one instance would corrupt each other.
+        with inference_lock:
+            return model.transcribe(audio, **options)
+
+    def evict(self, model_name):
+        """Drop a model from the registry"""
+        with self._lock:
+            return self._models.pop(model_name, None) is not None
+
+    def clear(self):
+        """Drop all loaded models"""
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        """Return the loaded models (most recently used last) and memory usage"""
+        with self._lock:
+            return {
+                "loaded_models": list(self._models.keys()),
+                "estimated_memory_mb": self._used_mb(),
+                "memory_budget_mb": self.memory_budget_mb
+            }
+
+
+# Shared by every route and service in this process
+model_registry = WhisperModelRegistry()
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import glob
+import hashlib
+import logging
+import threading
+from common.file_hash import hash_file, forget_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv(
+    'TRANSCRIPT_CACHE_DIR',
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'transcripts')
+)
+DEFAULT_MAX_SIZE_MB = float(os.getenv('TRANSCRIPT_CACHE_MAX_MB', '500'))
+
+# Options that only affect console output, not the transcript itself
+IGNORED_OPTIONS = {'verbose'}
+
+
+class TranscriptCache:
+    """Disk cache of full Whisper results keyed by video content hash, model and decode options"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _options_key(self, model_name, options):
+        options = {k: v for k, v in (options or {}).items() if k not in IGNORED_OPTIONS}
+        payload = json.dumps({"model": model_name, "options": options}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def _entry_path(self, video_hash, model_name, options):
+        return os.path.join(self.cache_dir, f"{video_hash}_{self._options_key(model_name, options)}.json")
+
+    def get(self, video_path, model_name, options=None):
+        """Return the cached Whisper result for this video, or None"""
+        try:
+            entry_path = self._entry_path(hash_file(video_path), model_name, options)
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Touch the entry so eviction treats it as recently used
+            os.utime(entry_path, None)
+            with self._lock:
+                self.hits += 1
+            logger.info(f"Transcript cache hit for {video_path}")
+            return entry['result']
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable transcript cache entry for {video_path}: {str(e)}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+    def put(self, video_path, model_name, options, result):
+        """Store a Whisper result and evict old entries beyond the size limit"""
+        try:
+            video_hash = hash_file(video_path)
+            entry_path = self._entry_path(video_hash, model_name, options)
+            entry = {
+                "video_hash": video_hash,
+                "model": model_name,
+                "options": {k: v for k, v in (options or {}).items() if k not in IGNORED_OPTIONS},
+                "created_at": time.time(),
+                "result": result
+            }
+            # Write to a temp file first so concurrent readers never see a partial entry
+            tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, default=float)
+            os.replace(tmp_path, entry_path)
+            self._enforce_size_limit()
+        except Exception as e:
+            logger.warning(f"Failed to cache transcript for {video_path}: {str(e)}")
+
+    def _enforce_size_limit(self):
+        with self._lock:
+            entries = []
+            for path in glob.glob(os.path.join(self.cache_dir, '*.json')):
+                try:
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                except FileNotFoundError:
+                    continue
+
+            total = sum(size for _, size, _ in entries)
+            # Oldest (least recently used) first
+            for _, size, path in sorted(entries):
+                if total <= self.max_size_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted transcript cache entry: {os.path.basename(path)}")
+                except FileNotFoundError:
+                    continue
+
+    def invalidate(self, video_path=None, video_hash=None):
+        """Remove every cached transcript for a video (e.g. after its file is replaced)
+
+        Both the previously seen content of video_path and its current content are
+        dropped, so this can be called before or after the file is overwritten.
+        """
+        hashes = set()
+        if video_hash:
+            hashes.add(video_hash)
+        if video_path:
+            previous_hash = forget_file(video_path)
+            if previous_hash:
+                hashes.add(previous_hash)
+            if os.path.exists(video_path):
+                hashes.add(hash_file(video_path))
+
+        removed = 0
+        for h in hashes:
+            for path in glob.glob(os.path.join(self.cache_dir, f"{h}_*.json")):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+        logger.info(f"Invalidated {removed} transcript cache entries")
+        return removed
+
+    def stats(self):
+        """Return hit/miss counters and current disk usage"""
+        paths = glob.glob(os.path.join(self.cache_dir, '*.json'))
+        size = 0
+        for path in paths:
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+        return {
+            "entries": len(paths),
+            "size_mb": round(size / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "misses": self.misses
+        }
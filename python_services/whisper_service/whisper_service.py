@@ -1,42 +1,78 @@
 import os
+import json
 import logging
+import contextlib
+from common.file_hash import hash_file
+from common.single_flight import SingleFlight
+from common.video_processor import VideoProcessor
+from whisper_service.model_registry import model_registry, model_size_mb, import_whisper
+from whisper_service.transcript_cache import TranscriptCache
+from whisper_service.chunked_transcriber import (
+    ChunkedTranscriber, build_result, load_wav, SAMPLE_RATE, CHUNKED_MIN_SECONDS, DEFAULT_WORKERS
+)
 
 logger = logging.getLogger(__name__)
 
+# Short first chunk so streaming clients get text within seconds
+STREAM_FIRST_CHUNK_SECONDS = 20
+# Longer recordings are decoded as a bounded stream of blocks instead of one array
+AUDIO_IN_MEMORY_MAX_SECONDS = float(os.getenv('AUDIO_IN_MEMORY_MAX_SECONDS', '7200'))
+# Free memory a transcription needs on top of its model: decoded audio and inference buffers
+TRANSCRIBE_HEADROOM_MB = float(os.getenv('WHISPER_TRANSCRIBE_HEADROOM_MB', '700'))
+
 class WhisperService:
-    def __init__(self):
+    def __init__(self, registry=None, transcript_cache=None, video_processor=None, chunk_workers=DEFAULT_WORKERS,
+                 slot=None):
+        """slot: callable taking the free memory (MB) a decode needs and returning a context manager
+        held around it, e.g. an admission "cpu" slot; chunk workers each take their own"""
+        self.registry = registry or model_registry
+        self.chunk_workers = chunk_workers
+        self.slot = slot or (lambda min_free_mb: contextlib.nullcontext())
+        self.transcript_cache = transcript_cache or TranscriptCache()
+        self.video_processor = video_processor or VideoProcessor()
         self.model = None
         self._whisper = None
+        self._flights = SingleFlight("transcribe")
     
     def _import_whisper(self):
         """Import whisper with error handling"""
-        try:
-            # Try importing from openai_whisper specifically
-            import openai_whisper as whisper
-            self._whisper = whisper
-            return whisper
-        except ImportError:
-            try:
-                # Fallback to regular whisper import
-                import whisper
-                self._whisper = whisper
-                return whisper
-            except ImportError as e:
-                logger.error(f"Whisper import failed: {e}")
-                raise ImportError("OpenAI Whisper is not installed. Run: pip install openai-whisper")
+        self._whisper = import_whisper()
+        return self._whisper
     
     def load_model(self, model_name="base"):
-        """Load Whisper model (lazy loading)"""
-        if self.model is None:
+        """Load Whisper model from the shared registry (lazy loading)"""
+        try:
+            self.model = self.registry.get_model(model_name)
+        except Exception as e:
+            logger.error(f"Error loading Whisper model: {e}")
+            raise
+        return self.model
+    
+    def _model_slot(self, model_name):
+        """Slot for one Whisper decode, with room for the model it runs (a chunk worker loads its own)"""
+        return self.slot(model_size_mb(model_name) + TRANSCRIBE_HEADROOM_MB)
+    
+    def _chunked(self, model_name):
+        return ChunkedTranscriber(model_name, self.chunk_workers, slot=lambda: self._model_slot(model_name))
+    
+    def transcribe_array(self, audio, model_name="base", **options):
+        """Transcribe a 16kHz float32 array, splitting long audio across the worker pool"""
+        if self.chunk_workers > 1 and len(audio) / SAMPLE_RATE >= CHUNKED_MIN_SECONDS:
+            return self._chunked(model_name).transcribe(audio, **options)
+        with self._model_slot(model_name):
+            return self.registry.transcribe(audio, model_name, **options)
+    
+    def transcribe_file(self, audio_path, model_name="base", **options):
+        """Transcribe an audio file, splitting long 16kHz WAVs across the worker pool"""
+        if self.chunk_workers > 1 and audio_path.lower().endswith('.wav'):
             try:
-                whisper = self._import_whisper()
-                logger.info(f"Loading Whisper model: {model_name}")
-                self.model = whisper.load_model(model_name)
-                logger.info("Whisper model loaded successfully")
+                audio = load_wav(audio_path)
             except Exception as e:
-                logger.error(f"Error loading Whisper model: {e}")
-                raise
-        return self.model
+                logger.warning(f"Could not read {audio_path} for chunking, transcribing in one pass: {e}")
+            else:
+                return self.transcribe_array(audio, model_name, **options)
+        with self._model_slot(model_name):
+            return self.registry.transcribe(audio_path, model_name, **options)
     
     def transcribe_audio(self, audio_path, model_name="tiny"):
         """Transcribe audio using OpenAI Whisper - Optimized for speed"""
@@ -54,8 +90,9 @@ class WhisperService:
             
             # Transcribe with optimized parameters for speed
             try:
-                result = model.transcribe(
+                result = self.transcribe_file(
                     audio_path,
+                    model_name,
                     fp16=False,  # Disable fp16 for better compatibility
                     language='en',  # Specify language for faster processing
                     task='transcribe',  # Explicitly set task
@@ -75,7 +112,8 @@ class WhisperService:
                 # Try with fallback parameters
                 try:
                     logger.info("Retrying with fallback parameters...")
-                    result = model.transcribe(audio_path, fp16=False, language='en')
+                    with self._model_slot(model_name):
+                        result = self.registry.transcribe(audio_path, model_name, fp16=False, language='en')
                     transcript = result.get('text', '')
                     return transcript
                 except Exception as e2:
@@ -84,4 +122,58 @@ class WhisperService:
             
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    def _fits_in_memory(self, video_path):
+        duration = self.video_processor.get_duration(video_path)
+        return duration is None or duration <= AUDIO_IN_MEMORY_MAX_SECONDS
+
+    def transcribe_video(self, video_path, model_name="base", **options):
+        """Return the full Whisper result (text and segments) for a video, using the transcript cache"""
+        cached = self.transcript_cache.get(video_path, model_name, options)
+        if cached is not None:
+            return cached
+        
+        # Concurrent requests for the same file and options share one transcription
+        key = (hash_file(video_path), model_name, json.dumps(options, sort_keys=True, default=str))
+        return self._flights.do(key, self._transcribe_uncached, video_path, model_name, options)
+
+    def _transcribe_uncached(self, video_path, model_name, options):
+        if self._fits_in_memory(video_path):
+            logger.info("Decoding audio into memory...")
+            with self.slot(None):
+                audio = self.video_processor.load_audio(video_path)
+            
+            logger.info("Transcribing audio with Whisper...")
+            result = self.transcribe_array(audio, model_name, **options)
+        else:
+            logger.info("Long recording, transcribing audio as a bounded stream...")
+            transcriber = self._chunked(model_name)
+            blocks = self.video_processor.iter_audio_blocks(video_path)
+            segments = list(transcriber.iter_block_segments(blocks, **options))
+            result = build_result(segments, transcriber.language)
+        
+        self.transcript_cache.put(video_path, model_name, options, result)
+        return result
+
+    def stream_transcribe_video(self, video_path, model_name="base", **options):
+        """Yield ("segment", segment) events as audio is decoded, then ("result", full_result)"""
+        cached = self.transcript_cache.get(video_path, model_name, options)
+        if cached is not None:
+            for seg in cached.get('segments', []):
+                yield "segment", seg
+            yield "result", cached
+            return
+        
+        # Decoding block by block lets the first chunk start before ffmpeg reaches the end
+        logger.info("Streaming transcription with Whisper...")
+        transcriber = self._chunked(model_name)
+        blocks = self.video_processor.iter_audio_blocks(video_path)
+        segments = []
+        for seg in transcriber.iter_block_segments(blocks, first_chunk_seconds=STREAM_FIRST_CHUNK_SECONDS, **options):
+            segments.append(seg)
+            yield "segment", seg
+        
+        result = build_result(segments, transcriber.language)
+        self.transcript_cache.put(video_path, model_name, options, result)
+        yield "result", result
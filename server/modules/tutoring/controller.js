@@ -609,6 +609,35 @@ exports.getVideoById = async (req, res) => {
   }
 }; 
 
+// Get several videos by ID in one call (used by the AI service to resolve videos in bulk)
+exports.getVideosByIds = async (req, res) => {
+  try {
+    const ids = Array.isArray(req.body.ids) ? req.body.ids : [];
+    if (ids.length === 0 || ids.length > 200) {
+      return res.status(400).json({ message: 'ids must be a list of 1 to 200 video IDs' });
+    }
+
+    const validIds = ids.filter(id => mongoose.Types.ObjectId.isValid(id));
+    const videos = await Video.find({ _id: { $in: validIds } })
+      .select('title description videoFile thumbnail duration status');
+
+    res.json({
+      videos: videos.map(video => ({
+        id: video._id,
+        title: video.title,
+        description: video.description,
+        videoFile: video.videoFile,
+        thumbnail: video.thumbnail,
+        status: video.status,
+        duration: video.duration && !isNaN(video.duration) ? video.duration : null
+      }))
+    });
+  } catch (error) {
+    console.error('Error in getVideosByIds:', error);
+    res.status(500).json({ message: 'Server error' });
+  }
+};
+
 // Get published videos by degree, year, semester, and module
 exports.getPublishedVideos = async (req, res) => {
   try {
@@ -29,6 +29,9 @@ router.post('/upload', uploadVideo);
 // Get student's videos
 router.get('/videos', getStudentVideos);
 
+// Get several videos by ID
+router.post('/videos/batch', require('./controller').getVideosByIds);
+
 // Get a single video by ID
 router.get('/videos/:videoId', require('./controller').getVideoById);
 